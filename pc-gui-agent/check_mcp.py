@@ -1,175 +1,288 @@
 """
 检测MCP是否启用和使用
 """
+import asyncio
+import functools
+import io
 import os
 import sys
 from pathlib import Path
+from typing import Optional, TextIO
+
+from dotenv import load_dotenv
 
 # 添加src目录到路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-def check_environment_variables():
-    """检查环境变量"""
-    print("=" * 60)
-    print("1. 检查环境变量")
-    print("=" * 60)
+# 环境变量在导入时读取并缓存，需先加载 .env（与 src.main 一致）
+load_dotenv()
+
+# 检测所需的模块在启动时统一导入一次，各项检测只读取导入结果
+try:
+    import mcp
+except ImportError:
+    mcp = None
+
+try:
+    from src.main import create_agent
+    from src.core.types import AgentConfig
+    _CODE_IMPORT_ERROR = None
+except Exception as e:
+    _CODE_IMPORT_ERROR = e
+
+try:
+    from src.mcp.client import MCPClient
+    _MCP_CLIENT_IMPORT_ERROR = None
+except ImportError as e:
+    MCPClient = None
+    _MCP_CLIENT_IMPORT_ERROR = e
+
+
+@functools.lru_cache(maxsize=None)
+def _env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """读取环境变量（检测过程中环境变量不会变化，每个变量只读取一次）"""
+    return os.environ.get(name, default)
+
+
+MCP_ENABLED_BOOL = _env("MCP_ENABLED", "false").lower() == "true"
+
+# 各段输出使用的分隔线
+_BANNER = "=" * 60
+
+
+async def check_environment_variables(out: Optional[TextIO] = None):
+    """检查环境变量（输出写入 out，默认为标准输出，下同）"""
+    print(_BANNER, file=out)
+    print("1. 检查环境变量", file=out)
+    print(_BANNER, file=out)
     
-    mcp_enabled = os.getenv("MCP_ENABLED", "not set")
-    mcp_server_command = os.getenv("MCP_SERVER_COMMAND", "not set")
-    mcp_transport = os.getenv("MCP_TRANSPORT", "not set")
+    mcp_enabled = _env("MCP_ENABLED") or "not set"
+    mcp_server_command = _env("MCP_SERVER_COMMAND") or "not set"
+    mcp_transport = _env("MCP_TRANSPORT") or "not set"
     
-    print(f"MCP_ENABLED: {mcp_enabled}")
-    print(f"MCP_SERVER_COMMAND: {mcp_server_command}")
-    print(f"MCP_TRANSPORT: {mcp_transport}")
-    print()
+    print(f"MCP_ENABLED: {mcp_enabled}", file=out)
+    print(f"MCP_SERVER_COMMAND: {mcp_server_command}", file=out)
+    print(f"MCP_TRANSPORT: {mcp_transport}", file=out)
+    print(file=out)
     
     # 判断是否启用
-    is_enabled = mcp_enabled.lower() == "true"
+    is_enabled = MCP_ENABLED_BOOL
     has_command = mcp_server_command != "not set" and mcp_server_command
     
     if is_enabled and has_command:
-        print("[OK] MCP环境变量已正确设置")
+        print("[OK] MCP环境变量已正确设置", file=out)
         return True
     else:
-        print("[X] MCP环境变量未设置或配置不完整")
+        print("[X] MCP环境变量未设置或配置不完整", file=out)
         if not is_enabled:
-            print("   - MCP_ENABLED 未设置为 'true'")
+            print("   - MCP_ENABLED 未设置为 'true'", file=out)
         if not has_command:
-            print("   - MCP_SERVER_COMMAND 未设置")
+            print("   - MCP_SERVER_COMMAND 未设置", file=out)
         return False
 
-def check_mcp_package():
+async def check_mcp_package(out: Optional[TextIO] = None):
     """检查MCP包是否安装"""
-    print("=" * 60)
-    print("2. 检查MCP包安装")
-    print("=" * 60)
+    print(_BANNER, file=out)
+    print("2. 检查MCP包安装", file=out)
+    print(_BANNER, file=out)
     
-    try:
-        import mcp
-        print(f"[OK] MCP包已安装")
-        try:
-            print(f"   版本信息: {mcp.__version__ if hasattr(mcp, '__version__') else '未知'}")
-        except:
-            pass
-        return True
-    except ImportError:
-        print("[X] MCP包未安装")
-        print("   安装命令: pip install mcp")
+    if mcp is None:
+        print("[X] MCP包未安装", file=out)
+        print("   安装命令: pip install mcp", file=out)
         return False
+    
+    print(f"[OK] MCP包已安装", file=out)
+    try:
+        print(f"   版本信息: {mcp.__version__ if hasattr(mcp, '__version__') else '未知'}", file=out)
+    except:
+        pass
+    return True
 
-def check_code_configuration():
+async def check_code_configuration(out: Optional[TextIO] = None):
     """检查代码配置"""
-    print("=" * 60)
-    print("3. 检查代码配置")
-    print("=" * 60)
+    print(_BANNER, file=out)
+    print("3. 检查代码配置", file=out)
+    print(_BANNER, file=out)
     
     try:
-        from src.main import create_agent
-        from src.core.types import AgentConfig
+        if _CODE_IMPORT_ERROR is not None:
+            raise _CODE_IMPORT_ERROR
         
         # 创建测试配置
         config = AgentConfig(
-            mcp_enabled=os.getenv("MCP_ENABLED", "false").lower() == "true",
-            mcp_server_command=os.getenv("MCP_SERVER_COMMAND"),
-            mcp_transport=os.getenv("MCP_TRANSPORT", "stdio")
+            mcp_enabled=MCP_ENABLED_BOOL,
+            mcp_server_command=_env("MCP_SERVER_COMMAND"),
+            mcp_transport=_env("MCP_TRANSPORT", "stdio")
         )
         
-        print(f"mcp_enabled: {config.mcp_enabled}")
-        print(f"mcp_server_command: {config.mcp_server_command}")
-        print(f"mcp_transport: {config.mcp_transport}")
-        print()
+        print(f"mcp_enabled: {config.mcp_enabled}", file=out)
+        print(f"mcp_server_command: {config.mcp_server_command}", file=out)
+        print(f"mcp_transport: {config.mcp_transport}", file=out)
+        print(file=out)
         
         if config.mcp_enabled and config.mcp_server_command:
-            print("[OK] 代码配置正确，MCP将被启用")
+            print("[OK] 代码配置正确，MCP将被启用", file=out)
             return True
         else:
-            print("[X] 代码配置显示MCP未启用")
+            print("[X] 代码配置显示MCP未启用", file=out)
             return False
             
     except Exception as e:
-        print(f"[X] 检查代码配置时出错: {e}")
+        print(f"[X] 检查代码配置时出错: {e}", file=out)
         return False
 
-async def check_mcp_connection():
-    """检查MCP连接（如果已配置）"""
-    print("=" * 60)
-    print("4. 检查MCP连接")
-    print("=" * 60)
+async def connect_with_retry(
+    client: MCPClient,
+    max_retries: int = 3,
+    backoff_base: float = 0.5,
+    out: Optional[TextIO] = None
+) -> bool:
+    """
+    连接MCP服务器，对服务器启动过程中的瞬时失败进行指数退避重试
+    
+    Args:
+        client: MCP客户端
+        max_retries: 最大尝试次数
+        backoff_base: 退避基数（秒），第n次重试前等待 backoff_base * 2**n
+        out: 输出流（默认为标准输出）
+        
+    Returns:
+        是否连接成功
+    """
+    for attempt in range(max_retries):
+        try:
+            if client.connected or await client.connect():
+                return True
+        except (ConnectionError, TimeoutError, OSError) as e:
+            print(f"   连接出错（第{attempt + 1}次）: {e}", file=out)
+        
+        if attempt < max_retries - 1:
+            delay = backoff_base * (2 ** attempt)
+            print(f"   {delay:.1f}秒后重试连接...", file=out)
+            await asyncio.sleep(delay)
+    return False
+
+async def check_mcp_connection(client: Optional[MCPClient] = None, out: Optional[TextIO] = None):
+    """
+    检查MCP连接（如果已配置）
+    
+    Args:
+        client: 外部管理的MCP客户端（可选）。传入时复用该连接，由调用方负责断开；
+            未传入时在函数内部创建、连接并断开
+        out: 输出流（默认为标准输出）
+    """
+    print(_BANNER, file=out)
+    print("4. 检查MCP连接", file=out)
+    print(_BANNER, file=out)
     
-    mcp_enabled = os.getenv("MCP_ENABLED", "false").lower() == "true"
-    mcp_server_command = os.getenv("MCP_SERVER_COMMAND")
+    mcp_server_command = _env("MCP_SERVER_COMMAND")
     
-    if not mcp_enabled or not mcp_server_command:
-        print("[!] MCP未启用，跳过连接测试")
+    if not MCP_ENABLED_BOOL or not mcp_server_command:
+        print("[!] MCP未启用，跳过连接测试", file=out)
         return None
     
+    owns_client = client is None
     try:
-        from src.mcp.client import MCPClient
-        
-        print(f"尝试连接到MCP服务器: {mcp_server_command}")
-        client = MCPClient(
-            server_command=mcp_server_command,
-            transport=os.getenv("MCP_TRANSPORT", "stdio")
-        )
+        print(f"尝试连接到MCP服务器: {mcp_server_command}", file=out)
+        if owns_client:
+            if MCPClient is None:
+                raise _MCP_CLIENT_IMPORT_ERROR
+            
+            client = MCPClient(
+                server_command=mcp_server_command,
+                transport=_env("MCP_TRANSPORT", "stdio")
+            )
         
-        connected = await client.connect()
+        connected = await connect_with_retry(client, out=out)
         if connected:
-            print("[OK] MCP服务器连接成功")
+            print("[OK] MCP服务器连接成功", file=out)
             
             # 列出工具
             tools = await client.list_tools()
-            print(f"   发现 {len(tools)} 个MCP工具:")
+            print(f"   发现 {len(tools)} 个MCP工具:", file=out)
             for tool in tools[:5]:  # 只显示前5个
-                print(f"   - {tool.get('name')}: {tool.get('description', 'N/A')}")
+                print(f"   - {tool.get('name')}: {tool.get('description', 'N/A')}", file=out)
             if len(tools) > 5:
-                print(f"   ... 还有 {len(tools) - 5} 个工具")
+                print(f"   ... 还有 {len(tools) - 5} 个工具", file=out)
             
-            await client.disconnect()
+            if owns_client:
+                await client.disconnect()
             return True
         else:
-            print("[X] MCP服务器连接失败")
+            print("[X] MCP服务器连接失败", file=out)
             return False
             
     except Exception as e:
-        print(f"[X] MCP连接测试失败: {e}")
+        print(f"[X] MCP连接测试失败: {e}", file=out)
         import traceback
-        traceback.print_exc()
+        traceback.print_exc(file=out)
         return False
 
-def main():
-    """主函数"""
-    print("\n" + "=" * 60)
-    print("MCP使用情况检测")
-    print("=" * 60 + "\n")
+async def run_connection_checks(out: Optional[TextIO] = None):
+    """使用同一个MCP客户端完成所有连接相关检测，整个过程只建立一次连接"""
+    if not MCP_ENABLED_BOOL or not _env("MCP_SERVER_COMMAND"):
+        return await check_mcp_connection(out=out)
     
-    results = {}
+    if MCPClient is None:
+        # 由检测函数自行报告导入失败
+        return await check_mcp_connection(out=out)
     
-    # 1. 检查环境变量
-    results["环境变量"] = check_environment_variables()
-    print()
+    client = MCPClient(
+        server_command=_env("MCP_SERVER_COMMAND"),
+        transport=_env("MCP_TRANSPORT", "stdio")
+    )
+    try:
+        return await check_mcp_connection(client, out=out)
+    finally:
+        await client.disconnect()
+
+async def run_all_checks():
+    """
+    并发执行所有检测，按检测顺序输出结果
     
-    # 2. 检查MCP包
-    results["MCP包"] = check_mcp_package()
-    print()
+    MCP连接检测最先启动，服务器子进程启动期间同时完成其余检测。
+    每项检测的输出写入各自的缓冲区，全部完成后按检测顺序打印，避免内容交错
     
-    # 3. 检查代码配置
-    results["代码配置"] = check_code_configuration()
-    print()
+    Returns:
+        检测名称到检测结果的字典
+    """
+    checks = [
+        ("环境变量", check_environment_variables),
+        ("MCP包", check_mcp_package),
+        ("代码配置", check_code_configuration),
+        ("MCP连接", run_connection_checks),
+    ]
+    outputs = [io.StringIO() for _ in checks]
     
-    # 4. 检查MCP连接（异步）
-    import asyncio
-    try:
-        connection_result = asyncio.run(check_mcp_connection())
-        results["MCP连接"] = connection_result
-    except Exception as e:
-        print(f"连接测试出错: {e}")
-        results["MCP连接"] = None
-    print()
+    # 逆序创建任务，使连接检测最先开始运行
+    tasks = [
+        asyncio.ensure_future(check(out))
+        for (_, check), out in zip(reversed(checks), reversed(outputs))
+    ]
+    outcomes = await asyncio.gather(*reversed(tasks), return_exceptions=True)
+    
+    results = {}
+    for (name, _), out, outcome in zip(checks, outputs, outcomes):
+        print(out.getvalue(), end="")
+        if isinstance(outcome, Exception):
+            print(f"{name}检测出错: {outcome}")
+            outcome = None
+        results[name] = outcome
+        print()
+    return results
+
+def main():
+    """主函数"""
+    print("\n" + _BANNER)
+    print("MCP使用情况检测")
+    print(_BANNER + "\n")
+    
+    results = asyncio.run(run_all_checks())
     
     # 总结
-    print("=" * 60)
+    print(_BANNER)
     print("检测结果总结")
-    print("=" * 60)
+    print(_BANNER)
     
     for name, result in results.items():
         if result is True:
@@ -3,28 +3,53 @@
 """
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+def _remove_tree(path: Path) -> list:
+    """删除目录，返回删除失败的 (路径, 异常) 列表"""
+    failures = []
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=lambda func, failed, exc: failures.append((failed, exc)))
+    else:
+        shutil.rmtree(path, onerror=lambda func, failed, exc_info: failures.append((failed, exc_info[1])))
+    return failures
+
+def _remove_file(path: Path) -> list:
+    """删除文件，返回删除失败的 (路径, 异常) 列表"""
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        return [(str(path), e)]
+    return []
+
 def clear_pycache():
     """清理所有__pycache__目录和.pyc文件"""
     base_dir = Path(__file__).parent
     src_dir = base_dir / "src"
     
+    # 删除操作以文件系统调用为主（会释放GIL），使用线程池并发执行
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    
+    # 一次遍历收集所有__pycache__目录
+    caches = list(src_dir.rglob("__pycache__"))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        cache_failures = list(executor.map(_remove_tree, caches))
+    
+    # 删除__pycache__之外残留的.pyc文件
+    stray_pycs = [p for p in src_dir.rglob("*.pyc") if p.parent.name != "__pycache__"]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pyc_failures = list(executor.map(_remove_file, stray_pycs))
+    
+    # 只列出完全删除成功的路径
     removed = []
-    for root, dirs, files in os.walk(src_dir):
-        # 删除__pycache__目录
-        if "__pycache__" in dirs:
-            cache_dir = Path(root) / "__pycache__"
-            shutil.rmtree(cache_dir)
-            removed.append(str(cache_dir))
-            dirs.remove("__pycache__")
-        
-        # 删除.pyc文件
-        for file in files:
-            if file.endswith(".pyc"):
-                pyc_file = Path(root) / file
-                pyc_file.unlink()
-                removed.append(str(pyc_file))
+    failed = []
+    for path, failures in zip(caches + stray_pycs, cache_failures + pyc_failures):
+        if failures:
+            failed.extend(failures)
+        else:
+            removed.append(str(path))
     
     if removed:
         print(f"已清理 {len(removed)} 个缓存文件/目录:")
@@ -34,6 +59,11 @@ def clear_pycache():
             print(f"  ... 还有 {len(removed) - 10} 个")
     else:
         print("没有找到缓存文件")
+    
+    if failed:
+        print(f"有 {len(failed)} 个文件/目录删除失败:")
+        for path, error in failed:
+            print(f"  - {path}: {error}")
 
 if __name__ == "__main__":
     clear_pycache()
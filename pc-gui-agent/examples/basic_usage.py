@@ -2,6 +2,7 @@
 基础使用示例
 """
 import asyncio
+import os
 import sys
 from pathlib import Path
 
@@ -10,6 +11,9 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.main import create_agent
 
+# 设置 PCGA_DEBUG=1 时输出完整的异常堆栈
+DEBUG = os.getenv("PCGA_DEBUG") == "1"
+
 
 async def main():
     """主函数"""
@@ -51,9 +55,10 @@ async def main():
             print(f"  置信度: {reflection.confidence:.2f}")
     
     except Exception as e:
-        print(f"\n执行出错: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"\n执行出错: {type(e).__name__}: {e}")
+        if DEBUG:
+            import traceback
+            traceback.print_exc()
     
     finally:
         # 关闭Agent
@@ -0,0 +1,53 @@
+"""
+examples 目录下 MCP 测试的 pytest 配置
+
+所有测试共享同一个会话级 MCP 客户端（通过连接池获取），
+MCP 服务器进程在整个测试会话中只启动一次
+"""
+import sys
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+# 添加src目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.mcp.client_pool import get_client_pool
+from test_python_mcp import TOOL_TESTS, _resolve_mcp_command
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client():
+    """会话级MCP客户端fixture"""
+    mcp_argv, _ = _resolve_mcp_command()
+    pool = get_client_pool()
+    try:
+        mcp_client = await pool.checkout(mcp_argv)
+    except ConnectionError as e:
+        pytest.skip(f"无法连接MCP服务器: {e}")
+    try:
+        yield mcp_client
+    finally:
+        await pool.checkin(mcp_argv)
+        await pool.close_all()
+
+
+@pytest.fixture
+def tool_name(request, client):
+    """待测试的工具名称，服务器不提供该工具时跳过"""
+    if request.param not in {tool.get("name") for tool in client.get_tools()}:
+        pytest.skip(f"{request.param} 工具不可用")
+    return request.param
+
+
+def pytest_generate_tests(metafunc):
+    """为 test_call_tool 生成工具调用用例"""
+    if {"tool_name", "arguments"} <= set(metafunc.fixturenames):
+        metafunc.parametrize(
+            ("tool_name", "arguments"),
+            list(TOOL_TESTS.items()),
+            indirect=["tool_name"],
+            ids=list(TOOL_TESTS)
+        )
+
@@ -2,33 +2,337 @@
 简单的MCP服务器模拟器（用于测试）
 模拟MCP服务器响应，实现基本的文件读写工具
 """
+import functools
 import json
+import os
+import stat
 import sys
 import asyncio
 from pathlib import Path
+from typing import Awaitable, Callable
 
+# 优先使用 orjson（C扩展，直接输出bytes），未安装时回退到标准库 json
+try:
+    import orjson
 
-async def read_line():
-    """异步读取一行输入"""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, sys.stdin.readline)
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
+    _loads = json.loads
 
-async def write_line(data):
-    """异步写入一行输出"""
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, lambda: (sys.stdout.write(data), sys.stdout.flush()))
+
+# 可用工具定义（模块加载时构建一次，并预先序列化）
+_TOOLS = [
+    {
+        "name": "read_file",
+        "description": "读取文件内容",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "path": {
+                    "type": "string",
+                    "description": "要读取的文件路径"
+                }
+            },
+            "required": ["path"]
+        }
+    },
+    {
+        "name": "write_file",
+        "description": "写入文件内容",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "path": {
+                    "type": "string",
+                    "description": "要写入的文件路径"
+                },
+                "content": {
+                    "type": "string",
+                    "description": "要写入的文件内容"
+                }
+            },
+            "required": ["path", "content"]
+        }
+    },
+    {
+        "name": "list_directory",
+        "description": "列出目录内容",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "path": {
+                    "type": "string",
+                    "description": "要列出的目录路径"
+                }
+            },
+            "required": ["path"]
+        }
+    }
+]
+_TOOLS_JSON_BODY = _dumps({"tools": _TOOLS})
+
+
+def _tools_list_response(req_id) -> bytes:
+    """构建tools/list响应（只拼接请求id，不再重复序列化工具列表）"""
+    return b'{"jsonrpc":"2.0","id":' + _dumps(req_id) + b',"result":' + _TOOLS_JSON_BODY + b'}\n'
+
+
+@functools.lru_cache(maxsize=64)
+def _read_text(path: str, mtime_ns: int, size: int) -> str:
+    """
+    读取文件内容
+    
+    以(路径, 修改时间, 大小)为缓存键，重复读取未修改的文件直接命中缓存，
+    文件被修改后键随之变化，自动重新读取
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _handle_list(request) -> bytes:
+    """处理tools/list请求，返回工具列表（与初始化时相同）"""
+    return _tools_list_response(request["id"])
+
+
+def _handle_call(request) -> bytes:
+    """处理tools/call请求，模拟工具执行"""
+    tool_name = request["params"]["name"]
+    args = request["params"]["arguments"]
+    
+    # 模拟工具执行
+    result = None
+    error = None
+    
+    try:
+        if tool_name == "read_file":
+            file_path = Path(args["path"])
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                st = None
+            if st is not None and stat.S_ISREG(st.st_mode):
+                content = _read_text(str(file_path), st.st_mtime_ns, st.st_size)
+                result = {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": content
+                        }
+                    ]
+                }
+            else:
+                error = {
+                    "code": -32602,
+                    "message": f"文件不存在或不是文件: {args['path']}"
+                }
+        
+        elif tool_name == "write_file":
+            file_path = Path(args["path"])
+            # 确保目录存在
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            # 一次编码后直接写入字节，不经过文本包装层
+            file_path.write_bytes(args["content"].encode("utf-8"))
+            
+            result = {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": f"成功写入文件: {args['path']}"
+                    }
+                ]
+            }
+        
+        elif tool_name == "list_directory":
+            dir_path = Path(args["path"])
+            if dir_path.exists() and dir_path.is_dir():
+                items = []
+                for item in dir_path.iterdir():
+                    item_type = "目录" if item.is_dir() else "文件"
+                    items.append(f"{item_type}: {item.name}")
+                
+                result = {
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "\n".join(items) if items else "目录为空"
+                        }
+                    ]
+                }
+            else:
+                error = {
+                    "code": -32602,
+                    "message": f"目录不存在: {args['path']}"
+                }
+        
+        else:
+            error = {
+                "code": -32601,
+                "message": f"未知工具: {tool_name}"
+            }
+    
+    except Exception as e:
+        error = {
+            "code": -32603,
+            "message": f"工具执行错误: {str(e)}"
+        }
+    
+    # 发送响应
+    response = {
+        "jsonrpc": "2.0",
+        "id": request["id"]
+    }
+    
+    if error:
+        response["error"] = error
+    else:
+        response["result"] = result
+    
+    return _dumps(response) + b"\n"
+
+
+def _handle_unknown(request) -> bytes:
+    """处理未知方法"""
+    response = {
+        "jsonrpc": "2.0",
+        "id": request.get("id"),
+        "error": {
+            "code": -32601,
+            "message": f"未知方法: {request.get('method')}"
+        }
+    }
+    return _dumps(response) + b"\n"
+
+
+# 请求方法到处理函数的分发表
+_HANDLERS = {
+    "tools/list": _handle_list,
+    "tools/call": _handle_call,
+}
+
+
+async def open_stdio():
+    """
+    打开标准输入输出
+    
+    返回 (按行读取器, 写出函数)。非Windows平台将stdin/stdout包装为asyncio流，
+    读写直接走事件循环而不经过线程池；Windows的事件循环不支持继承的匿名管道，
+    仍在线程池中执行阻塞读写
+    """
+    loop = asyncio.get_running_loop()
+    
+    if sys.platform == "win32":
+        async def read_chunk() -> bytes:
+            return await loop.run_in_executor(None, sys.stdin.buffer.read1, _READ_CHUNK_SIZE)
+        
+        def _write_and_flush(data: bytes):
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        
+        async def write(data: bytes):
+            await loop.run_in_executor(None, _write_and_flush, data)
+        
+        return StdioLineReader(read_chunk), write
+    
+    reader = asyncio.StreamReader()
+    protocol = asyncio.StreamReaderProtocol(reader)
+    await loop.connect_read_pipe(lambda: protocol, sys.stdin)
+    transport, write_protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, sys.stdout
+    )
+    writer = asyncio.StreamWriter(transport, write_protocol, reader, loop)
+    
+    async def write(data: bytes):
+        writer.write(data)
+        await writer.drain()
+    
+    return StdioLineReader(functools.partial(reader.read, _READ_CHUNK_SIZE)), write
+
+
+# 每次从标准输入读取的最大字节数
+_READ_CHUNK_SIZE = 65536
+
+
+class StdioLineReader:
+    """
+    按行读取请求
+    
+    自行维护已读入但尚未处理的数据，从而可以判断是否已有完整的待处理请求
+    """
+    
+    def __init__(self, read_chunk: Callable[[], Awaitable[bytes]]):
+        self._read_chunk = read_chunk
+        self._buffer = bytearray()
+    
+    def has_line(self) -> bool:
+        """缓冲区中是否已有完整的一行"""
+        return b"\n" in self._buffer
+    
+    async def readline(self) -> bytes:
+        """读取一行（包含换行符），输入结束时返回剩余数据（可能为空）"""
+        while True:
+            pos = self._buffer.find(b"\n")
+            if pos != -1:
+                line = bytes(self._buffer[:pos + 1])
+                del self._buffer[:pos + 1]
+                return line
+            chunk = await self._read_chunk()
+            if not chunk:
+                line = bytes(self._buffer)
+                self._buffer.clear()
+                return line
+            self._buffer += chunk
+
+
+class BufferedLineWriter:
+    """
+    合并相邻的响应输出
+    
+    响应先缓存在内存中，只有在没有已到达的待处理请求时才一次性写出并drain，
+    流水线请求的多个响应因此只需要一次write系统调用
+    """
+    
+    def __init__(self, write: Callable[[bytes], Awaitable[None]]):
+        self._write = write
+        self._pending = []
+    
+    def write(self, data: bytes):
+        """缓存一行输出"""
+        self._pending.append(data)
+    
+    async def flush(self):
+        """将缓存的输出一次性写出"""
+        if not self._pending:
+            return
+        data = b"".join(self._pending)
+        self._pending.clear()
+        await self._write(data)
+
+
+async def read_line(reader: StdioLineReader, out: BufferedLineWriter) -> bytes:
+    """读取一行请求；若缓冲区中没有完整的待处理请求，先写出已缓存的响应再等待"""
+    if not reader.has_line():
+        await out.flush()
+    return await reader.readline()
 
 
 async def mock_mcp_server():
     """模拟MCP服务器"""
+    out = None
     try:
+        reader, write = await open_stdio()
+        out = BufferedLineWriter(write)
+        
         # 读取初始化请求
-        init_request_str = await read_line()
+        init_request_str = await read_line(reader, out)
         if not init_request_str:
             return
         
-        init_request = json.loads(init_request_str.strip())
+        init_request = _loads(init_request_str)
         
         # 发送初始化响应
         init_response = {
@@ -45,247 +349,31 @@ async def mock_mcp_server():
                 }
             }
         }
-        await write_line(json.dumps(init_response) + "\n")
+        out.write(_dumps(init_response) + b"\n")
         
         # 处理工具列表请求
-        tools_request_str = await read_line()
+        tools_request_str = await read_line(reader, out)
         if not tools_request_str:
             return
         
-        tools_request = json.loads(tools_request_str.strip())
+        tools_request = _loads(tools_request_str)
         
-        # 定义可用工具
-        tools_response = {
-            "jsonrpc": "2.0",
-            "id": tools_request["id"],
-            "result": {
-                "tools": [
-                    {
-                        "name": "read_file",
-                        "description": "读取文件内容",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "path": {
-                                    "type": "string",
-                                    "description": "要读取的文件路径"
-                                }
-                            },
-                            "required": ["path"]
-                        }
-                    },
-                    {
-                        "name": "write_file",
-                        "description": "写入文件内容",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "path": {
-                                    "type": "string",
-                                    "description": "要写入的文件路径"
-                                },
-                                "content": {
-                                    "type": "string",
-                                    "description": "要写入的文件内容"
-                                }
-                            },
-                            "required": ["path", "content"]
-                        }
-                    },
-                    {
-                        "name": "list_directory",
-                        "description": "列出目录内容",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "path": {
-                                    "type": "string",
-                                    "description": "要列出的目录路径"
-                                }
-                            },
-                            "required": ["path"]
-                        }
-                    }
-                ]
-            }
-        }
-        await write_line(json.dumps(tools_response) + "\n")
+        # 返回可用工具列表
+        out.write(_tools_list_response(tools_request["id"]))
         
-        # 处理工具调用请求
+        # 处理后续请求（按method分发）
         while True:
-            request_str = await read_line()
+            request_str = await read_line(reader, out)
             if not request_str:
                 break
             
-            request = json.loads(request_str.strip())
-            
-            # 处理tools/list请求
-            if request.get("method") == "tools/list":
-                # 返回工具列表（与初始化时相同）
-                list_response = {
-                    "jsonrpc": "2.0",
-                    "id": request["id"],
-                    "result": {
-                        "tools": [
-                            {
-                                "name": "read_file",
-                                "description": "读取文件内容",
-                                "inputSchema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "path": {
-                                            "type": "string",
-                                            "description": "要读取的文件路径"
-                                        }
-                                    },
-                                    "required": ["path"]
-                                }
-                            },
-                            {
-                                "name": "write_file",
-                                "description": "写入文件内容",
-                                "inputSchema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "path": {
-                                            "type": "string",
-                                            "description": "要写入的文件路径"
-                                        },
-                                        "content": {
-                                            "type": "string",
-                                            "description": "要写入的文件内容"
-                                        }
-                                    },
-                                    "required": ["path", "content"]
-                                }
-                            },
-                            {
-                                "name": "list_directory",
-                                "description": "列出目录内容",
-                                "inputSchema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "path": {
-                                            "type": "string",
-                                            "description": "要列出的目录路径"
-                                        }
-                                    },
-                                    "required": ["path"]
-                                }
-                            }
-                        ]
-                    }
-                }
-                await write_line(json.dumps(list_response) + "\n")
-                continue
-            
-            # 处理tools/call请求
-            if request.get("method") == "tools/call":
-                tool_name = request["params"]["name"]
-                args = request["params"]["arguments"]
-                
-                # 模拟工具执行
-                result = None
-                error = None
-                
-                try:
-                    if tool_name == "read_file":
-                        file_path = Path(args["path"])
-                        if file_path.exists() and file_path.is_file():
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                content = f.read()
-                            result = {
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": content
-                                    }
-                                ]
-                            }
-                        else:
-                            error = {
-                                "code": -32602,
-                                "message": f"文件不存在或不是文件: {args['path']}"
-                            }
-                    
-                    elif tool_name == "write_file":
-                        file_path = Path(args["path"])
-                        # 确保目录存在
-                        file_path.parent.mkdir(parents=True, exist_ok=True)
-                        
-                        with open(file_path, "w", encoding="utf-8") as f:
-                            f.write(args["content"])
-                        
-                        result = {
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": f"成功写入文件: {args['path']}"
-                                }
-                            ]
-                        }
-                    
-                    elif tool_name == "list_directory":
-                        dir_path = Path(args["path"])
-                        if dir_path.exists() and dir_path.is_dir():
-                            items = []
-                            for item in dir_path.iterdir():
-                                item_type = "目录" if item.is_dir() else "文件"
-                                items.append(f"{item_type}: {item.name}")
-                            
-                            result = {
-                                "content": [
-                                    {
-                                        "type": "text",
-                                        "text": "\n".join(items) if items else "目录为空"
-                                    }
-                                ]
-                            }
-                        else:
-                            error = {
-                                "code": -32602,
-                                "message": f"目录不存在: {args['path']}"
-                            }
-                    
-                    else:
-                        error = {
-                            "code": -32601,
-                            "message": f"未知工具: {tool_name}"
-                        }
-                
-                except Exception as e:
-                    error = {
-                        "code": -32603,
-                        "message": f"工具执行错误: {str(e)}"
-                    }
-                
-                # 发送响应
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request["id"]
-                }
-                
-                if error:
-                    response["error"] = error
-                else:
-                    response["result"] = result
-                
-                await write_line(json.dumps(response) + "\n")
-            
-            else:
-                # 未知方法
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id"),
-                    "error": {
-                        "code": -32601,
-                        "message": f"未知方法: {request.get('method')}"
-                    }
-                }
-                await write_line(json.dumps(response) + "\n")
+            request = _loads(request_str)
+            out.write(_HANDLERS.get(request.get("method"), _handle_unknown)(request))
     
     except Exception as e:
         # 发生错误时，尝试发送错误响应
+        if out is None:
+            raise
         try:
             error_response = {
                 "jsonrpc": "2.0",
@@ -294,9 +382,16 @@ async def mock_mcp_server():
                     "message": f"服务器内部错误: {str(e)}"
                 }
             }
-            await write_line(json.dumps(error_response) + "\n")
+            out.write(_dumps(error_response) + b"\n")
         except:
             pass
+    
+    finally:
+        if out is not None:
+            try:
+                await out.flush()
+            except Exception:
+                pass
 
 
 if __name__ == "__main__":
@@ -9,6 +9,8 @@ Python MCP 服务器 - 文件系统工具
 或者通过环境变量：
     $env:MCP_SERVER_COMMAND="python examples/python_mcp_server.py"
 """
+import os
+import stat
 import sys
 from pathlib import Path
 from typing import Any
@@ -24,6 +26,29 @@ except ImportError:
 # 创建 MCP 服务器
 mcp = FastMCP("Python FileSystem Server")
 
+# list_directory 输出中固定不变的部分
+_RULE_EQ80 = "=" * 80 + "\n"
+_RULE_DASH80 = "-" * 80 + "\n"
+_LIST_HEADER = f"{'类型':6s}  {'名称':50s}  {'大小':>10s}\n"
+
+
+def _error(e: Exception) -> str:
+    """格式化工具错误信息"""
+    return f"错误: {e}"
+
+
+def _mode(path: str):
+    """
+    获取路径的 st_mode（一次 stat 系统调用）
+    
+    Returns:
+        st_mode，路径不存在时返回 None
+    """
+    try:
+        return os.stat(path).st_mode
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
 
 @mcp.tool()
 def read_file(path: str) -> str:
@@ -37,17 +62,16 @@ def read_file(path: str) -> str:
         文件内容（字符串）
     """
     try:
-        file_path = Path(path)
-        if not file_path.exists():
+        mode = _mode(path)
+        if mode is None:
             raise FileNotFoundError(f"文件不存在: {path}")
-        if not file_path.is_file():
+        if not stat.S_ISREG(mode):
             raise ValueError(f"路径不是文件: {path}")
         
         # 读取文件内容
-        content = file_path.read_text(encoding='utf-8')
-        return content
-    except Exception as e:
-        return f"错误: {str(e)}"
+        return Path(path).read_text(encoding='utf-8')
+    except (OSError, ValueError) as e:
+        return _error(e)
 
 
 @mcp.tool()
@@ -71,8 +95,8 @@ def write_file(path: str, content: str) -> str:
         # 写入文件
         file_path.write_text(content, encoding='utf-8')
         return f"成功写入文件: {path}"
-    except Exception as e:
-        return f"错误: {str(e)}"
+    except (OSError, ValueError) as e:
+        return _error(e)
 
 
 @mcp.tool()
@@ -87,32 +111,32 @@ def list_directory(path: str = ".") -> str:
         目录内容列表（字符串格式）
     """
     try:
-        dir_path = Path(path)
-        if not dir_path.exists():
+        mode = _mode(path)
+        if mode is None:
             raise FileNotFoundError(f"目录不存在: {path}")
-        if not dir_path.is_dir():
+        if not stat.S_ISDIR(mode):
             raise ValueError(f"路径不是目录: {path}")
         
         # 列出目录内容
+        # os.scandir 返回的 DirEntry 会缓存目录读取时得到的类型信息，
+        # 避免对每个条目再单独发起 is_dir/is_file 的 stat 调用
         items = []
-        for item in sorted(dir_path.iterdir()):
-            item_type = "目录" if item.is_dir() else "文件"
-            size = item.stat().st_size if item.is_file() else 0
-            items.append(f"{item_type:6s}  {item.name:50s}  {size:>10d} bytes")
-        
-        result = f"目录: {path}\n"
-        result += "=" * 80 + "\n"
-        result += f"{'类型':6s}  {'名称':50s}  {'大小':>10s}\n"
-        result += "-" * 80 + "\n"
-        if items:
-            result += "\n".join(items)
-        else:
-            result += "(空目录)"
-        result += "\n"
+        with os.scandir(path) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                item_type = "目录" if entry.is_dir() else "文件"
+                size = entry.stat().st_size if entry.is_file() else 0
+                items.append(f"{item_type:6s}  {entry.name:50s}  {size:>10d} bytes")
         
-        return result
-    except Exception as e:
-        return f"错误: {str(e)}"
+        return "".join([
+            f"目录: {path}\n",
+            _RULE_EQ80,
+            _LIST_HEADER,
+            _RULE_DASH80,
+            "\n".join(items) if items else "(空目录)",
+            "\n",
+        ])
+    except (OSError, ValueError) as e:
+        return _error(e)
 
 
 @mcp.tool()
@@ -126,11 +150,7 @@ def file_exists(path: str) -> bool:
     Returns:
         如果存在返回 True，否则返回 False
     """
-    try:
-        file_path = Path(path)
-        return file_path.exists()
-    except Exception:
-        return False
+    return os.path.exists(path)
 
 
 @mcp.tool()
@@ -145,22 +165,22 @@ def get_file_info(path: str) -> str:
         文件或目录的详细信息（字符串格式）
     """
     try:
-        file_path = Path(path)
-        if not file_path.exists():
+        try:
+            st = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
             return f"错误: 路径不存在: {path}"
         
         info = []
-        info.append(f"路径: {file_path.absolute()}")
-        info.append(f"类型: {'目录' if file_path.is_dir() else '文件'}")
+        info.append(f"路径: {Path(path).absolute()}")
+        info.append(f"类型: {'目录' if stat.S_ISDIR(st.st_mode) else '文件'}")
         
-        if file_path.is_file():
-            stat = file_path.stat()
-            info.append(f"大小: {stat.st_size} bytes")
-            info.append(f"修改时间: {stat.st_mtime}")
+        if stat.S_ISREG(st.st_mode):
+            info.append(f"大小: {st.st_size} bytes")
+            info.append(f"修改时间: {st.st_mtime}")
         
         return "\n".join(info)
-    except Exception as e:
-        return f"错误: {str(e)}"
+    except (OSError, ValueError) as e:
+        return _error(e)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 测试 MCP 获取本地浏览器应用
 """
 import asyncio
+import re
 import sys
 import os
 from pathlib import Path
@@ -10,9 +11,126 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.mcp.client import MCPClient
+from src.utils.logger import get_logger
 
+logger = get_logger(__name__)
 
-async def find_browser_related_tools(tools):
+
+# MCP 相关环境变量在导入时解析一次
+_MCP_COMMAND = os.getenv("MCP_SERVER_COMMAND")
+# 是否配置为模拟服务器（模拟服务器不支持获取浏览器应用）
+_IS_MOCK_SERVER = bool(_MCP_COMMAND) and "mock_mcp_server" in _MCP_COMMAND.lower()
+
+
+# 浏览器/应用程序相关关键词，编译为一个忽略大小写的正则，每个字段只需扫描一次
+BROWSER_KEYWORDS = (
+    "browser", "application", "app", "chrome", "firefox", "edge",
+    "safari", "list", "get", "installed", "launch", "open"
+)
+_KW_RE = re.compile("|".join(map(re.escape, BROWSER_KEYWORDS)), re.IGNORECASE)
+
+# 安装了 pyahocorasick 时改用 Aho-Corasick 自动机做多模式匹配，否则回退到上面的正则
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+if ahocorasick is not None:
+    _KW_AC = ahocorasick.Automaton()
+    for _kw in BROWSER_KEYWORDS:
+        _KW_AC.add_word(_kw, _kw)
+    _KW_AC.make_automaton()
+    del _kw
+
+    def _has_keyword(text):
+        """判断文本中是否包含任一浏览器相关关键词"""
+        return next(_KW_AC.iter(text.lower()), None) is not None
+else:
+    def _has_keyword(text):
+        """判断文本中是否包含任一浏览器相关关键词"""
+        return _KW_RE.search(text) is not None
+
+# 列出应用程序的 MCP 工具的规范名称；新增名称只需修改这一处
+APP_LIST_TOOL_NAMES = frozenset({
+    "list_applications", "get_browsers", "list_browsers",
+    "get_installed_browsers", "list_installed_apps", "get_applications",
+})
+# 工具名中包含上述任一名称（忽略大小写）即视为候选
+_APP_LIST_RE = re.compile(
+    "|".join(map(re.escape, sorted(APP_LIST_TOOL_NAMES))),
+    re.IGNORECASE
+)
+
+
+# 帮助文本，导入时构建一次，失败路径上一次性输出
+_HELP_NO_MCP_COMMAND = """\
+⚠️  未设置 MCP_SERVER_COMMAND 环境变量
+
+   快速配置方法：
+
+   方法 1：使用快速配置脚本（推荐）
+   Windows PowerShell: .\\examples\\setup_mcp.ps1
+
+   方法 2：手动设置环境变量
+   Windows PowerShell:
+   $env:MCP_ENABLED='true'
+   $env:MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'
+
+   Linux/Mac:
+   export MCP_ENABLED='true'
+   export MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'
+
+   详细说明请参考: examples/QUICK_START_MCP.md
+"""
+
+_HELP_MOCK_SERVER = """\
+⚠️  检测到使用的是模拟 MCP 服务器
+   模拟服务器不支持获取本地浏览器应用功能
+
+   建议使用真实的 MCP 服务器：
+   - Puppeteer MCP 服务器（推荐）：
+     $env:MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'
+   - Filesystem MCP 服务器：
+     $env:MCP_SERVER_COMMAND='python -m mcp.server.filesystem'
+
+   详细说明请参考: examples/QUICK_START_MCP.md
+"""
+
+_HELP_CONNECT_FAILED = """\
+❌ 连接失败
+
+   可能的原因：
+   - MCP 服务器命令不正确
+   - MCP 服务器未安装或不可用
+   - Node.js 或 Python 未正确安装
+
+   解决方案：
+   1. 检查环境变量：
+      MCP_SERVER_COMMAND={mcp_command}
+
+   2. 手动测试 MCP 服务器命令是否能运行
+
+   3. 使用快速配置脚本重新配置：
+      .\\examples\\setup_mcp.ps1
+
+   4. 查看详细配置说明：
+      examples/QUICK_START_MCP.md
+"""
+
+_HELP_NO_BROWSER_TOOLS = """\
+⚠️  没有找到与浏览器/应用程序相关的工具
+
+   可能的原因：
+   - 当前 MCP 服务器不支持应用程序列表功能
+   - 需要使用支持浏览器控制的 MCP 服务器（如 Puppeteer）
+
+   建议尝试：
+   - 使用 Puppeteer MCP 服务器：
+     $env:MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'
+"""
+
+
+def find_browser_related_tools(tools):
     """
     查找与浏览器/应用程序相关的工具
     
@@ -22,62 +140,22 @@ async def find_browser_related_tools(tools):
     Returns:
         相关的工具列表
     """
-    browser_keywords = [
-        "browser", "application", "app", "chrome", "firefox", "edge", 
-        "safari", "list", "get", "installed", "launch", "open"
+    # 检查工具名称或描述中是否包含浏览器相关关键词
+    return [
+        tool for tool in tools
+        if _has_keyword(tool.get('name', '')) or _has_keyword(tool.get('description', ''))
     ]
-    
-    related_tools = []
-    for tool in tools:
-        tool_name = tool.get('name', '').lower()
-        tool_desc = tool.get('description', '').lower()
-        
-        # 检查工具名称或描述中是否包含浏览器相关关键词
-        if any(keyword in tool_name or keyword in tool_desc for keyword in browser_keywords):
-            related_tools.append(tool)
-    
-    return related_tools
 
 
 def check_mcp_setup():
     """检查 MCP 配置"""
-    mcp_command = os.getenv("MCP_SERVER_COMMAND")
-    mcp_enabled = os.getenv("MCP_ENABLED", "false").lower() == "true"
-    
-    if not mcp_command:
-        print("⚠️  未设置 MCP_SERVER_COMMAND 环境变量")
-        print()
-        print("   快速配置方法：")
-        print()
-        print("   方法 1：使用快速配置脚本（推荐）")
-        print("   Windows PowerShell: .\\examples\\setup_mcp.ps1")
-        print()
-        print("   方法 2：手动设置环境变量")
-        print("   Windows PowerShell:")
-        print("   $env:MCP_ENABLED='true'")
-        print("   $env:MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'")
-        print()
-        print("   Linux/Mac:")
-        print("   export MCP_ENABLED='true'")
-        print("   export MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'")
-        print()
-        print("   详细说明请参考: examples/QUICK_START_MCP.md")
-        print()
+    if not _MCP_COMMAND:
+        print(_HELP_NO_MCP_COMMAND)
         return False
     
     # 检查是否是模拟服务器
-    if "mock_mcp_server" in mcp_command.lower():
-        print("⚠️  检测到使用的是模拟 MCP 服务器")
-        print("   模拟服务器不支持获取本地浏览器应用功能")
-        print()
-        print("   建议使用真实的 MCP 服务器：")
-        print("   - Puppeteer MCP 服务器（推荐）：")
-        print("     $env:MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'")
-        print("   - Filesystem MCP 服务器：")
-        print("     $env:MCP_SERVER_COMMAND='python -m mcp.server.filesystem'")
-        print()
-        print("   详细说明请参考: examples/QUICK_START_MCP.md")
-        print()
+    if _IS_MOCK_SERVER:
+        print(_HELP_MOCK_SERVER)
         return False
     
     return True
@@ -95,7 +173,7 @@ async def test_get_browser_apps():
         return False
     
     # 获取 MCP 服务器命令
-    mcp_command = os.getenv("MCP_SERVER_COMMAND")
+    mcp_command = _MCP_COMMAND
     
     # 创建 MCP 客户端
     client = MCPClient(
@@ -110,25 +188,7 @@ async def test_get_browser_apps():
         connected = await client.connect()
         
         if not connected:
-            print("❌ 连接失败")
-            print()
-            print("   可能的原因：")
-            print("   - MCP 服务器命令不正确")
-            print("   - MCP 服务器未安装或不可用")
-            print("   - Node.js 或 Python 未正确安装")
-            print()
-            print("   解决方案：")
-            print("   1. 检查环境变量：")
-            print(f"      MCP_SERVER_COMMAND={mcp_command}")
-            print()
-            print("   2. 手动测试 MCP 服务器命令是否能运行")
-            print()
-            print("   3. 使用快速配置脚本重新配置：")
-            print("      .\\examples\\setup_mcp.ps1")
-            print()
-            print("   4. 查看详细配置说明：")
-            print("      examples/QUICK_START_MCP.md")
-            print()
+            print(_HELP_CONNECT_FAILED.format(mcp_command=mcp_command))
             return False
         
         print("✅ 连接成功\n")
@@ -144,95 +204,81 @@ async def test_get_browser_apps():
         
         # 显示所有工具
         print("   所有工具列表：")
-        for i, tool in enumerate(tools, 1):
-            print(f"   {i}. {tool.get('name')}: {tool.get('description', 'N/A')}")
+        sys.stdout.write("\n".join(
+            f"   {i}. {tool.get('name')}: {tool.get('description', 'N/A')}"
+            for i, tool in enumerate(tools, 1)
+        ) + "\n")
         print()
         
         # 3. 查找与浏览器/应用程序相关的工具
         print("3. 查找与浏览器/应用程序相关的工具...")
-        browser_tools = await find_browser_related_tools(tools)
+        browser_tools = find_browser_related_tools(tools)
         
         if not browser_tools:
-            print("⚠️  没有找到与浏览器/应用程序相关的工具")
-            print()
-            print("   可能的原因：")
-            print("   - 当前 MCP 服务器不支持应用程序列表功能")
-            print("   - 需要使用支持浏览器控制的 MCP 服务器（如 Puppeteer）")
-            print()
-            print("   建议尝试：")
-            print("   - 使用 Puppeteer MCP 服务器：")
-            print("     $env:MCP_SERVER_COMMAND='npx -y @modelcontextprotocol/server-puppeteer'")
-            print()
+            print(_HELP_NO_BROWSER_TOOLS)
             return False
         
         print(f"   找到 {len(browser_tools)} 个相关工具：")
-        for tool in browser_tools:
-            print(f"   - {tool.get('name')}: {tool.get('description', 'N/A')}")
+        sys.stdout.write("\n".join(
+            f"   - {tool.get('name')}: {tool.get('description', 'N/A')}"
+            for tool in browser_tools
+        ) + "\n")
         print()
         
         # 4. 尝试调用相关工具获取浏览器应用列表
         print("4. 尝试获取本地浏览器应用列表...")
         
-        # 常见的工具名称模式
-        possible_tool_names = [
-            "list_applications",
-            "get_browsers",
-            "list_browsers",
-            "get_installed_browsers",
-            "list_installed_apps",
-            "get_applications"
+        # 并发调用所有候选工具，总耗时取决于最慢的一次调用而不是调用次数
+        candidates = [
+            tool_name for tool_name in (tool.get('name') for tool in browser_tools)
+            if _APP_LIST_RE.search(tool_name)
         ]
+        results = await asyncio.gather(
+            *[client.call_tool(name=tool_name, arguments={}) for tool_name in candidates],
+            return_exceptions=True
+        )
         
+        # 按顺序报告各工具的调用结果，取第一个成功的结果
         success = False
-        for tool in browser_tools:
-            tool_name = tool.get('name')
+        for tool_name, result in zip(candidates, results):
+            print(f"   尝试调用工具: {tool_name}")
+            if isinstance(result, Exception):
+                print(f"   ❌ 调用失败: {result}")
+                continue
             
-            # 检查是否是列表应用程序的工具
-            if any(pattern in tool_name.lower() for pattern in possible_tool_names):
-                print(f"   尝试调用工具: {tool_name}")
-                try:
-                    # 尝试调用工具（可能需要不同的参数）
-                    result = await client.call_tool(
-                        name=tool_name,
-                        arguments={}
-                    )
+            if result:
+                if result.get("isError"):
+                    error = result.get('error', 'Unknown error')
+                    print(f"   ❌ 错误: {error}")
+                else:
+                    # 处理结果
+                    print(f"   ✅ 调用成功")
+                    print()
+                    print("   结果:")
                     
-                    if result:
-                        if result.get("isError"):
-                            error = result.get('error', 'Unknown error')
-                            print(f"   ❌ 错误: {error}")
-                        else:
-                            # 处理结果
-                            print(f"   ✅ 调用成功")
-                            print()
-                            print("   结果:")
-                            
-                            # 尝试提取文本内容
-                            if "text" in result:
-                                print(result["text"])
-                            elif "content" in result:
-                                content = result["content"]
-                                if isinstance(content, list) and len(content) > 0:
-                                    for item in content:
-                                        if isinstance(item, dict):
-                                            if "text" in item:
-                                                print(item["text"])
-                                            else:
-                                                print(item)
-                                        else:
-                                            print(item)
+                    # 尝试提取文本内容
+                    if "text" in result:
+                        print(result["text"])
+                    elif "content" in result:
+                        content = result["content"]
+                        if isinstance(content, list) and len(content) > 0:
+                            for item in content:
+                                if isinstance(item, dict):
+                                    if "text" in item:
+                                        print(item["text"])
+                                    else:
+                                        print(item)
                                 else:
-                                    print(content)
-                            elif "structuredContent" in result:
-                                print(result["structuredContent"])
-                            else:
-                                print(result)
-                            
-                            success = True
-                            break
-                except Exception as e:
-                    print(f"   ❌ 调用失败: {e}")
-                    continue
+                                    print(item)
+                        else:
+                            print(content)
+                    elif "structuredContent" in result:
+                        print(result["structuredContent"])
+                    else:
+                        print(result)
+                    
+                    success = True
+                    break
         
         if not success:
             print("   ⚠️  未能成功获取浏览器应用列表")
@@ -251,8 +297,7 @@ async def test_get_browser_apps():
         
     except Exception as e:
         print(f"❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("测试失败")
         return False
     finally:
         await client.disconnect()
@@ -260,19 +305,6 @@ async def test_get_browser_apps():
         print("已断开 MCP 连接")
 
 
-async def show_tool_details(client, tool_name):
-    """显示工具的详细信息"""
-    tools = await client.list_tools()
-    for tool in tools:
-        if tool.get('name') == tool_name:
-            print(f"\n工具详细信息: {tool_name}")
-            print(f"描述: {tool.get('description', 'N/A')}")
-            if 'inputSchema' in tool:
-                print(f"输入模式: {tool['inputSchema']}")
-            return tool
-    return None
-
-
 async def main():
     """主函数"""
     print()
@@ -2,9 +2,12 @@
 MCP功能测试示例
 """
 import asyncio
+import functools
+import io
 import sys
 import os
 from pathlib import Path
+from typing import Optional, TextIO
 
 # 添加src目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -14,64 +17,108 @@ from src.tools.mcp_tool import create_mcp_tools
 from src.tools.registry import ToolRegistry
 from src.core.types import AgentConfig
 from src.main import create_agent
+from src.utils.logger import get_logger
 
+logger = get_logger(__name__)
 
-async def test_mcp_client():
-    """测试MCP客户端连接和工具发现"""
-    print("=== 测试MCP客户端 ===\n")
+
+# MCP服务器命令在导入时解析一次
+_MCP_COMMAND = os.getenv("MCP_SERVER_COMMAND")
+
+# 注册到工具注册表的MCP工具名称前缀
+_MCP_TOOL_PREFIX = "mcp_"
+
+# Agent测试中预览显示的MCP工具数量
+_PREVIEW_LIMIT = 10
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_client() -> MCPClient:
+    """获取全局唯一的MCP客户端（首次调用时创建）"""
+    return MCPClient(server_command=_MCP_COMMAND, transport="stdio")
+
+
+# 未配置MCP服务器时的帮助文本，导入时构建一次
+_HELP_NO_MCP_COMMAND = """\
+⚠️  未设置MCP_SERVER_COMMAND环境变量
+
+   安装真实MCP服务器的方法：
+
+   方法1：使用Python MCP包（推荐）
+   - pip install mcp
+   - Windows: $env:MCP_SERVER_COMMAND='python -m mcp.server.filesystem'
+   - Linux/Mac: export MCP_SERVER_COMMAND='python -m mcp.server.filesystem'
+
+   方法2：使用npm包
+   - npm install -g @modelcontextprotocol/server-filesystem
+   - Windows: $env:MCP_SERVER_COMMAND='npx @modelcontextprotocol/server-filesystem'
+   - Linux/Mac: export MCP_SERVER_COMMAND='npx @modelcontextprotocol/server-filesystem'
+
+   方法3：使用模拟服务器（仅用于测试）
+   - Windows: $env:MCP_SERVER_COMMAND='python examples/mock_mcp_server.py'
+   - Linux/Mac: export MCP_SERVER_COMMAND='python examples/mock_mcp_server.py'
+
+   详细说明请参考: docs/MCP_SETUP.md
+"""
+
+
+# Agent测试完成后的使用提示
+_HELP_AGENT_READY = """\
+3. Agent已准备好使用MCP工具
+   可以通过以下方式测试：
+   - 运行GUI应用: python gui_main.py
+   - 或运行基础示例: python examples/basic_usage.py
+   - 在任务中使用MCP工具（如：读取文件、写入文件等）
+"""
+
+
+async def test_mcp_client(client: Optional[MCPClient] = None, out: Optional[TextIO] = None):
+    """
+    测试MCP客户端连接和工具发现
+    
+    Args:
+        client: 共享的MCP客户端（可选）。未传入时自行创建，并在结束时断开
+        out: 输出流（默认为标准输出）
+    """
+    print("=== 测试MCP客户端 ===\n", file=out)
     
     # 创建MCP客户端（需要配置MCP服务器命令）
-    mcp_command = os.getenv("MCP_SERVER_COMMAND")
+    mcp_command = _MCP_COMMAND
     if not mcp_command:
-        print("⚠️  未设置MCP_SERVER_COMMAND环境变量")
-        print()
-        print("   安装真实MCP服务器的方法：")
-        print()
-        print("   方法1：使用Python MCP包（推荐）")
-        print("   - pip install mcp")
-        print("   - Windows: $env:MCP_SERVER_COMMAND='python -m mcp.server.filesystem'")
-        print("   - Linux/Mac: export MCP_SERVER_COMMAND='python -m mcp.server.filesystem'")
-        print()
-        print("   方法2：使用npm包")
-        print("   - npm install -g @modelcontextprotocol/server-filesystem")
-        print("   - Windows: $env:MCP_SERVER_COMMAND='npx @modelcontextprotocol/server-filesystem'")
-        print("   - Linux/Mac: export MCP_SERVER_COMMAND='npx @modelcontextprotocol/server-filesystem'")
-        print()
-        print("   方法3：使用模拟服务器（仅用于测试）")
-        print("   - Windows: $env:MCP_SERVER_COMMAND='python examples/mock_mcp_server.py'")
-        print("   - Linux/Mac: export MCP_SERVER_COMMAND='python examples/mock_mcp_server.py'")
-        print()
-        print("   详细说明请参考: docs/MCP_SETUP.md")
-        print()
+        print(_HELP_NO_MCP_COMMAND, file=out)
         return False
     
-    client = MCPClient(
-        server_command=mcp_command,
-        transport="stdio"
-    )
+    owns_client = client is None
+    if owns_client:
+        client = _shared_client()
     
     try:
         # 连接MCP服务器
-        print("1. 连接到MCP服务器...")
+        print("1. 连接到MCP服务器...", file=out)
         connected = await client.connect()
         
         if not connected:
-            print("❌ 连接失败")
+            print("❌ 连接失败", file=out)
             return False
         
-        print("✅ 连接成功\n")
+        print("✅ 连接成功\n", file=out)
         
         # 列出可用工具
-        print("2. 发现可用工具...")
+        print("2. 发现可用工具...", file=out)
         tools = await client.list_tools()
-        print(f"   发现 {len(tools)} 个工具：")
-        for tool in tools:
-            print(f"   - {tool.get('name')}: {tool.get('description', 'N/A')}")
-        print()
+        print(f"   发现 {len(tools)} 个工具：", file=out)
+        names = [tool.get('name') for tool in tools]
+        has_read_file = 'read_file' in names
+        if tools:
+            print("\n".join(
+                f"   - {name}: {tool.get('description', 'N/A')}"
+                for name, tool in zip(names, tools)
+            ), file=out)
+        print(file=out)
         
         # 测试调用工具（如果有read_file工具）
-        if any(t.get('name') == 'read_file' for t in tools):
-            print("3. 测试调用read_file工具...")
+        if has_read_file:
+            print("3. 测试调用read_file工具...", file=out)
             result = await client.call_tool(
                 name="read_file",
                 arguments={"path": str(Path(__file__).parent.parent / "README.md")}
@@ -79,11 +126,11 @@ async def test_mcp_client():
             # 处理新的返回格式（官方 SDK）
             if result:
                 if result.get("isError"):
-                    print(f"   ❌ 错误: {result.get('error', 'Unknown error')}")
+                    print(f"   ❌ 错误: {result.get('error', 'Unknown error')}", file=out)
                 elif "text" in result:
                     # 使用提取的 text 字段
                     text = result["text"][:100]
-                    print(f"   结果: {text}...")
+                    print(f"   结果: {text}...", file=out)
                 elif "content" in result:
                     # 使用 content 数组
                     content = result["content"]
@@ -91,75 +138,88 @@ async def test_mcp_client():
                         first_item = content[0]
                         if isinstance(first_item, dict):
                             text = first_item.get("text", "")[:100]
-                            print(f"   结果: {text}...")
+                            print(f"   结果: {text}...", file=out)
                         else:
-                            print(f"   结果: {content}")
+                            print(f"   结果: {content}", file=out)
                     else:
-                        print(f"   结果: {result}")
+                        print(f"   结果: {result}", file=out)
                 elif "structuredContent" in result:
-                    print(f"   结构化结果: {result['structuredContent']}")
+                    print(f"   结构化结果: {result['structuredContent']}", file=out)
                 else:
-                    print(f"   结果: {result}")
+                    print(f"   结果: {result}", file=out)
             else:
-                print(f"   结果: {result}")
-            print()
+                print(f"   结果: {result}", file=out)
+            print(file=out)
         
         return True
         
     except Exception as e:
-        print(f"❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ 测试失败: {e}", file=out)
+        logger.exception("测试失败")
         return False
     finally:
-        await client.disconnect()
+        if owns_client:
+            await client.disconnect()
 
 
-async def test_mcp_tool_integration():
-    """测试MCP工具集成到工具系统"""
-    print("\n=== 测试MCP工具集成 ===\n")
+async def test_mcp_tool_integration(client: Optional[MCPClient] = None, out: Optional[TextIO] = None):
+    """
+    测试MCP工具集成到工具系统
+    
+    Args:
+        client: 共享的MCP客户端（可选）。未传入时自行创建，并在结束时断开
+        out: 输出流（默认为标准输出）
+    """
+    print("\n=== 测试MCP工具集成 ===\n", file=out)
     
-    mcp_command = os.getenv("MCP_SERVER_COMMAND")
+    mcp_command = _MCP_COMMAND
     if not mcp_command:
-        print("⚠️  未设置MCP_SERVER_COMMAND环境变量，跳过测试")
+        print("⚠️  未设置MCP_SERVER_COMMAND环境变量，跳过测试", file=out)
         return False
     
     # 创建MCP客户端
-    client = MCPClient(
-        server_command=mcp_command,
-        transport="stdio"
-    )
+    owns_client = client is None
+    if owns_client:
+        client = _shared_client()
     
     try:
-        # 连接
+        # 连接（共享客户端已连接时直接复用）
         await client.connect()
         
         # 创建工具包装器
-        print("1. 创建MCP工具包装器...")
-        mcp_tools = create_mcp_tools(client)
-        print(f"   创建了 {len(mcp_tools)} 个工具包装器\n")
+        print("1. 创建MCP工具包装器...", file=out)
+        # 连接时已发现的工具列表只取一次，直接交给包装器构建
+        tools = client.get_tools()
+        mcp_tools = create_mcp_tools(client, tools=tools)
+        print(f"   创建了 {len(mcp_tools)} 个工具包装器\n", file=out)
         
         if len(mcp_tools) == 0:
-            print("⚠️  没有发现MCP工具，跳过后续测试")
+            print("⚠️  没有发现MCP工具，跳过后续测试", file=out)
             return False
         
         # 注册到工具注册表
-        print("2. 注册到工具注册表...")
+        print("2. 注册到工具注册表...", file=out)
         registry = ToolRegistry()
         registry.register_multiple(mcp_tools)
         
         # 列出所有工具
-        print("3. 工具注册表中的工具：")
-        tools_list = registry.get_tools_list()
-        for tool in tools_list:
-            print(f"   - {tool['name']}: {tool['description']}")
-        print()
+        print("3. 工具注册表中的工具：", file=out)
+        # 一次遍历同时生成显示内容和MCP工具名称列表
+        lines = []
+        mcp_tool_names = []
+        for tool in registry.get_tools_list():
+            name = tool['name']
+            lines.append(f"   - {name}: {tool['description']}")
+            if name.startswith(_MCP_TOOL_PREFIX):
+                mcp_tool_names.append(name)
+        if lines:
+            print("\n".join(lines), file=out)
+        print(file=out)
         
         # 测试执行工具
-        mcp_tool_names = [t['name'] for t in tools_list if t['name'].startswith('mcp_')]
         if mcp_tool_names:
             test_tool_name = mcp_tool_names[0]
-            print(f"4. 测试执行MCP工具 '{test_tool_name}'...")
+            print(f"4. 测试执行MCP工具 '{test_tool_name}'...", file=out)
             
             # 根据工具名称确定参数
             test_args = None
@@ -168,8 +228,8 @@ async def test_mcp_tool_integration():
                 if test_file.exists():
                     test_args = {"path": str(test_file)}
                 else:
-                    print(f"   ⚠️  测试文件不存在: {test_file}")
-                    print(f"   跳过执行测试")
+                    print(f"   ⚠️  测试文件不存在: {test_file}", file=out)
+                    print(f"   跳过执行测试", file=out)
                     return True
             elif 'write_file' in test_tool_name or 'writeFile' in test_tool_name:
                 test_file = Path(__file__).parent / "test_output.txt"
@@ -184,99 +244,114 @@ async def test_mcp_tool_integration():
                 # Puppeteer navigate 工具
                 test_args = {"url": "https://www.example.com"}
             else:
-                print(f"   ⚠️  未知工具类型: {test_tool_name}")
-                print(f"   跳过执行测试")
+                print(f"   ⚠️  未知工具类型: {test_tool_name}", file=out)
+                print(f"   跳过执行测试", file=out)
                 return True
             
             if test_args:
                 result = await registry.execute(test_tool_name, test_args)
-                print(f"   执行结果: {result.get('success')}")
+                print(f"   执行结果: {result.get('success')}", file=out)
                 if result.get('success'):
                     data = result.get('data', '')
                     if isinstance(data, str) and len(data) > 100:
-                        print(f"   数据预览: {data[:100]}...")
-                        print(f"   数据长度: {len(data)} 字符")
+                        print(f"   数据预览: {data[:100]}...", file=out)
+                        print(f"   数据长度: {len(data)} 字符", file=out)
                     else:
-                        print(f"   数据: {data}")
+                        print(f"   数据: {data}", file=out)
                 else:
-                    print(f"   错误: {result.get('error')}")
-                    print(f"   消息: {result.get('message')}")
+                    print(f"   错误: {result.get('error')}", file=out)
+                    print(f"   消息: {result.get('message')}", file=out)
         
         return True
         
     except Exception as e:
-        print(f"❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ 测试失败: {e}", file=out)
+        logger.exception("测试失败")
         return False
     finally:
-        await client.disconnect()
+        if owns_client:
+            await client.disconnect()
 
 
-async def test_agent_with_mcp():
-    """测试Agent使用MCP工具"""
-    print("\n=== 测试Agent使用MCP工具 ===\n")
+async def test_agent_with_mcp(client: Optional[MCPClient] = None, out: Optional[TextIO] = None):
+    """
+    测试Agent使用MCP工具
+    
+    Args:
+        client: 共享的MCP客户端（可选）。传入时Agent复用该连接，不再另起MCP服务器进程
+        out: 输出流（默认为标准输出）
+    """
+    print("\n=== 测试Agent使用MCP工具 ===\n", file=out)
     
     # 创建配置
     config = AgentConfig(
         mcp_enabled=True,
-        mcp_server_command=os.getenv("MCP_SERVER_COMMAND"),
+        mcp_server_command=_MCP_COMMAND,
         mcp_transport="stdio"
     )
     
     if not config.mcp_server_command:
-        print("⚠️  未设置MCP_SERVER_COMMAND，跳过测试")
+        print("⚠️  未设置MCP_SERVER_COMMAND，跳过测试", file=out)
         return False
     
     # 创建Agent
     agent = create_agent(config)
+    if client is not None:
+        agent.mcp_client = client
     
     try:
         # 初始化（会自动连接MCP并注册工具）
-        print("1. 初始化Agent（会自动连接MCP）...")
+        print("1. 初始化Agent（会自动连接MCP）...", file=out)
         await agent.initialize()
-        print("✅ 初始化完成\n")
+        print("✅ 初始化完成\n", file=out)
         
         # 查看注册的工具
-        print("2. 已注册的工具：")
+        print("2. 已注册的工具：", file=out)
         tools_list = agent.tool_registry.get_tools_list()
-        # 过滤 MCP 工具（名称以 mcp_ 开头）
-        mcp_tools = [t for t in tools_list if t['name'].startswith('mcp_')]
-        gui_tools = [t for t in tools_list if not t['name'].startswith('mcp_')]
+        # 一次遍历统计 MCP 工具（名称以 mcp_ 开头）和 GUI 工具数量，同时收集前N个MCP工具用于预览
+        gui_count = mcp_count = 0
+        preview = []
+        for t in tools_list:
+            if t['name'].startswith(_MCP_TOOL_PREFIX):
+                mcp_count += 1
+                if len(preview) < _PREVIEW_LIMIT:
+                    preview.append(t)
+            else:
+                gui_count += 1
         
-        print(f"   GUI工具数量: {len(gui_tools)}")
-        print(f"   MCP工具数量: {len(mcp_tools)}")
-        print()
+        print(f"   GUI工具数量: {gui_count}", file=out)
+        print(f"   MCP工具数量: {mcp_count}", file=out)
+        print(file=out)
         
-        if mcp_tools:
-            print("   MCP工具列表（前10个）：")
-            for tool in mcp_tools[:10]:
-                # 显示工具名称和描述的前50个字符
-                desc_preview = tool['description'][:50] + "..." if len(tool['description']) > 50 else tool['description']
-                print(f"   - {tool['name']}: {desc_preview}")
-            if len(mcp_tools) > 10:
-                print(f"   ... 还有 {len(mcp_tools) - 10} 个工具")
-            print()
+        if preview:
+            print(f"   MCP工具列表（前{_PREVIEW_LIMIT}个）：", file=out)
+            # 显示工具名称和描述的前50个字符
+            print("\n".join(
+                f"   - {tool['name']}: "
+                + (tool['description'][:50] + "..." if len(tool['description']) > 50 else tool['description'])
+                for tool in preview
+            ), file=out)
+            if mcp_count > _PREVIEW_LIMIT:
+                print(f"   ... 还有 {mcp_count - _PREVIEW_LIMIT} 个工具", file=out)
+            print(file=out)
         else:
-            print("   ⚠️  未发现 MCP 工具")
-            print("   提示：检查 MCP_SERVER_COMMAND 环境变量是否正确设置")
-            print()
+            print("   ⚠️  未发现 MCP 工具", file=out)
+            print("   提示：检查 MCP_SERVER_COMMAND 环境变量是否正确设置", file=out)
+            print(file=out)
         
         # 注意：这里不执行实际任务，因为需要Ollama运行
-        print("3. Agent已准备好使用MCP工具")
-        print("   可以通过以下方式测试：")
-        print("   - 运行GUI应用: python gui_main.py")
-        print("   - 或运行基础示例: python examples/basic_usage.py")
-        print("   - 在任务中使用MCP工具（如：读取文件、写入文件等）")
+        print(_HELP_AGENT_READY, end="", file=out)
         
         return True
         
     except Exception as e:
-        print(f"❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ 测试失败: {e}", file=out)
+        logger.exception("测试失败")
         return False
     finally:
+        if client is not None:
+            # 共享客户端由调用方负责断开
+            agent.mcp_client = None
         await agent.close()
 
 
@@ -287,19 +362,35 @@ async def main():
     print("=" * 60)
     print()
     
-    results = []
-    
-    # 测试1：MCP客户端
-    result1 = await test_mcp_client()
-    results.append(("MCP客户端测试", result1))
+    # 三个测试共享同一个MCP客户端，只启动一次MCP服务器进程
+    client = _shared_client() if _MCP_COMMAND else None
     
-    # 测试2：MCP工具集成
-    result2 = await test_mcp_tool_integration()
-    results.append(("MCP工具集成测试", result2))
+    tests = [
+        ("MCP客户端测试", test_mcp_client),
+        ("MCP工具集成测试", test_mcp_tool_integration),
+        ("Agent使用MCP测试", test_agent_with_mcp),
+    ]
+    # 每个测试的输出写入各自的缓冲区，全部完成后按顺序打印，避免内容交错
+    outputs = [io.StringIO() for _ in tests]
+    try:
+        # 先建立连接，三个测试再并发执行
+        if client is not None:
+            await client.connect()
+        outcomes = await asyncio.gather(
+            *(test(client, out) for (_, test), out in zip(tests, outputs)),
+            return_exceptions=True
+        )
+    finally:
+        if client is not None:
+            await client.disconnect()
     
-    # 测试3：Agent使用MCP
-    result3 = await test_agent_with_mcp()
-    results.append(("Agent使用MCP测试", result3))
+    results = []
+    for (name, _), out, result in zip(tests, outputs, outcomes):
+        print(out.getvalue(), end="")
+        if isinstance(result, Exception):
+            print(f"❌ {name}出错: {result}")
+            result = False
+        results.append((name, result))
     
     # 输出测试结果摘要
     print("\n" + "=" * 60)
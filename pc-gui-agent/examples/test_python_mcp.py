@@ -4,22 +4,67 @@ Python MCP 服务器测试脚本
 专门用于测试 Python MCP 服务器（examples/python_mcp_server.py）是否正常运行
 """
 import asyncio
+import functools
 import sys
 import os
 import time
+import importlib.metadata
 import importlib.util
+import shlex
 from pathlib import Path
+from typing import List, Tuple
 
 # 添加src目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.mcp.client import MCPClient
+from src.mcp.client_pool import get_client_pool
 from src.utils.logger import get_logger
 
 # 设置日志级别为 DEBUG 以便查看详细日志
 logger = get_logger(__name__)
 logger.setLevel("DEBUG")
 
+# 通过 pytest 运行时，各测试与会话级客户端fixture（见 conftest.py）共用同一个事件循环
+try:
+    import pytest
+    pytestmark = pytest.mark.asyncio(loop_scope="session")
+except ImportError:
+    pytest = None
+
+
+# 工具调用测试：工具名称 -> 调用参数（仅测试服务器提供的工具）
+TOOL_TESTS = {
+    "read_file": {"path": str(Path(__file__).parent.parent / "README.md")},
+    "list_directory": {"path": str(Path(__file__).parent.parent)},
+}
+
+
+class CheckFailed(AssertionError):
+    """测试步骤未通过（失败信息已输出）"""
+
+
+async def _passed(check) -> bool:
+    """
+    执行一个测试步骤
+    
+    Args:
+        check: 测试步骤协程
+    
+    Returns:
+        测试步骤是否通过
+    """
+    try:
+        await check
+    except CheckFailed:
+        return False
+    return True
+
+
+def _truncate(text: str, limit: int) -> str:
+    """截取文本前 limit 个字符用于预览，超出部分以 ... 表示"""
+    return text[:limit] + "..." if len(text) > limit else text
+
 
 def check_python_mcp_package():
     """检查 Python MCP 包是否安装"""
@@ -27,16 +72,17 @@ def check_python_mcp_package():
     print("1. 检查 Python MCP 包安装")
     print("=" * 60)
     
-    try:
-        import mcp
+    # 只查找模块而不导入，避免执行 mcp 包的初始化代码
+    if check_module_exists("mcp"):
         print("✅ MCP 包已安装")
+        # 版本号从包的元数据读取，同样无需导入 mcp
         try:
-            version = getattr(mcp, '__version__', '未知')
-            print(f"   版本: {version}")
-        except:
-            pass
+            version = importlib.metadata.version("mcp")
+        except importlib.metadata.PackageNotFoundError:
+            version = "未知"
+        print(f"   版本: {version}")
         return True
-    except ImportError:
+    else:
         print("❌ MCP 包未安装")
         print()
         print("   安装命令:")
@@ -51,12 +97,11 @@ def check_mcp_fastmcp_module():
     print("2. 检查 mcp.server.fastmcp 模块")
     print("=" * 60)
     
-    try:
-        from mcp.server.fastmcp import FastMCP
+    if check_module_exists("mcp.server.fastmcp"):
         print("✅ mcp.server.fastmcp 模块可以导入")
         return True
-    except ImportError as e:
-        print(f"❌ 无法导入 mcp.server.fastmcp: {e}")
+    else:
+        print("❌ 无法导入 mcp.server.fastmcp: 模块不存在")
         print()
         print("   可能的原因:")
         print("   1. MCP 包未安装或版本过旧")
@@ -86,10 +131,14 @@ def check_python_mcp_server_file():
         return False
 
 
+@functools.lru_cache(maxsize=None)
 def check_module_exists(module_name: str) -> bool:
     """
     检测 Python 模块是否存在
     
+    结果按模块名缓存，同一模块只查找一次；修改 sys.path 后可调用
+    check_module_exists.cache_clear() 使缓存失效
+    
     Args:
         module_name: 模块名称，如 "mcp.server.filesystem"
     
@@ -103,134 +152,158 @@ def check_module_exists(module_name: str) -> bool:
         return False
 
 
-def check_environment_variables():
-    """检查环境变量配置"""
-    print("=" * 60)
-    print("4. 检查环境变量配置")
-    print("=" * 60)
+def _python_replaced_messages(original_command: str, mcp_command: str) -> List[str]:
+    """生成 python 命令被替换为当前解释器时的提示信息"""
+    return [
+        f"   ⚠️  检测到 'python' 命令，已自动替换为当前 Python 解释器",
+        f"   原始命令: {original_command}",
+        f"   修正命令: {mcp_command}",
+        f"   Python 解释器: {sys.executable}",
+        f"   (这确保使用 conda 虚拟环境的 Python 而不是系统 Python)",
+    ]
+
+
+def _python_server_argv() -> List[str]:
+    """使用当前 Python 解释器启动 python_mcp_server.py 的命令参数"""
+    server_file = Path(__file__).parent / "python_mcp_server.py"
+    if not server_file.exists():
+        server_file = Path("examples/python_mcp_server.py")
+    # 使用 sys.executable 确保使用当前 Python 解释器（conda 环境）
+    return [sys.executable, str(server_file)]
+
+
+@functools.cache
+def _resolve_mcp_command() -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    解析 MCP 服务器命令（每个进程只解析一次）
     
+    读取 MCP_SERVER_COMMAND 环境变量，将 python 命令替换为当前解释器，
+    模块不存在时回退到 python_mcp_server.py
+    
+    Returns:
+        (最终使用的命令参数列表, 解析过程中需要输出的提示信息)
+    
+    Raises:
+        ValueError: MCP_SERVER_COMMAND 格式错误（如引号不匹配），无法解析
+    """
+    messages = []
     mcp_command = os.getenv("MCP_SERVER_COMMAND")
+    python_exe = sys.executable
     
     if not mcp_command:
-        print("⚠️  MCP_SERVER_COMMAND 环境变量未设置")
-        print()
-        print("   设置方法 (Windows PowerShell):")
-        print("   $env:MCP_SERVER_COMMAND='python examples/python_mcp_server.py'")
-        print()
-        print("   设置方法 (Linux/Mac):")
-        print("   export MCP_SERVER_COMMAND='python examples/python_mcp_server.py'")
-        print()
+        messages += [
+            "⚠️  MCP_SERVER_COMMAND 环境变量未设置",
+            "",
+            "   设置方法 (Windows PowerShell):",
+            "   $env:MCP_SERVER_COMMAND='python examples/python_mcp_server.py'",
+            "",
+            "   设置方法 (Linux/Mac):",
+            "   export MCP_SERVER_COMMAND='python examples/python_mcp_server.py'",
+            "",
+        ]
         # 使用默认值：新创建的 Python MCP 服务器
-        server_file = Path(__file__).parent / "python_mcp_server.py"
-        if server_file.exists():
-            # 使用 sys.executable 确保使用当前 Python 解释器（conda 环境）
-            mcp_command = f"{sys.executable} {server_file}"
-        else:
-            mcp_command = f"{sys.executable} examples/python_mcp_server.py"
-        print(f"   使用默认值: {mcp_command}")
-    else:
-        print(f"✅ MCP_SERVER_COMMAND: {mcp_command}")
+        argv = _python_server_argv()
+        messages.append(f"   使用默认值: {shlex.join(argv)}")
+        return tuple(argv), tuple(messages)
+    
+    messages.append(f"✅ MCP_SERVER_COMMAND: {mcp_command}")
+    
+    # 使用 shlex.split 来正确解析命令（处理引号等），之后只修改命令参数列表，
+    # 直接用参数列表启动服务器，不再拼接为命令字符串
+    argv = shlex.split(mcp_command)
+    
+    # 检测并替换 python 命令为 sys.executable（确保使用 conda 虚拟环境的 Python）
+    if argv and argv[0] in ("python", "python3"):
+        # 替换第一个部分（python 或 python3）为 sys.executable
+        argv[0] = python_exe
+        replaced_command = shlex.join(argv)
         
-        # 检测并替换 python 命令为 sys.executable（确保使用 conda 虚拟环境的 Python）
-        original_command = mcp_command
-        python_exe = sys.executable
+        if replaced_command != mcp_command:
+            messages += _python_replaced_messages(mcp_command, replaced_command)
+    
+    # 检测是否是 -m 模块格式（如 python -m mcp.server.filesystem）
+    if len(argv) >= 3 and argv[1] == "-m":
+        module_name = argv[2]
+        messages.append(f"   检测到模块格式: -m {module_name}")
         
-        # 使用 shlex.split 来正确解析命令（处理引号等）
-        import shlex
-        try:
-            parts = shlex.split(mcp_command)
-            if parts and parts[0] in ("python", "python3"):
-                # 替换第一个部分（python 或 python3）为 sys.executable
-                parts[0] = python_exe
-                mcp_command = " ".join(shlex.quote(str(part)) for part in parts)
-                
-                if mcp_command != original_command:
-                    print(f"   ⚠️  检测到 'python' 命令，已自动替换为当前 Python 解释器")
-                    print(f"   原始命令: {original_command}")
-                    print(f"   修正命令: {mcp_command}")
-                    print(f"   Python 解释器: {python_exe}")
-                    print(f"   (这确保使用 conda 虚拟环境的 Python 而不是系统 Python)")
+        # 检测模块是否存在
+        if not check_module_exists(module_name):
+            messages += [
+                f"   ❌ 模块 '{module_name}' 不存在",
+                f"   (MCP Python SDK 不提供预构建的服务器，只提供构建服务器的框架)",
+                "",
+                f"   ⚠️  自动回退到 python_mcp_server.py 服务器",
+            ]
             
-            # 检测是否是 -m 模块格式（如 python -m mcp.server.filesystem）
-            if len(parts) >= 3 and parts[1] == "-m":
-                module_name = parts[2]
-                print(f"   检测到模块格式: -m {module_name}")
-                
-                # 检测模块是否存在
-                if not check_module_exists(module_name):
-                    print(f"   ❌ 模块 '{module_name}' 不存在")
-                    print(f"   (MCP Python SDK 不提供预构建的服务器，只提供构建服务器的框架)")
-                    print()
-                    print(f"   ⚠️  自动回退到 python_mcp_server.py 服务器")
-                    
-                    # 使用我们创建的服务器
-                    server_file = Path(__file__).parent / "python_mcp_server.py"
-                    if server_file.exists():
-                        mcp_command = f"{python_exe} {server_file}"
-                        print(f"   回退命令: {mcp_command}")
-                    else:
-                        mcp_command = f"{python_exe} examples/python_mcp_server.py"
-                        print(f"   回退命令: {mcp_command}")
-                else:
-                    print(f"   ✅ 模块 '{module_name}' 存在")
-        except Exception:
-            # 如果解析失败，尝试简单的字符串替换
-            if mcp_command.strip().startswith("python ") or mcp_command.strip().startswith("python3 "):
-                if mcp_command.strip().startswith("python "):
-                    mcp_command = mcp_command.replace("python ", f"{python_exe} ", 1)
-                elif mcp_command.strip().startswith("python3 "):
-                    mcp_command = mcp_command.replace("python3 ", f"{python_exe} ", 1)
-                
-                if mcp_command != original_command:
-                    print(f"   ⚠️  检测到 'python' 命令，已自动替换为当前 Python 解释器")
-                    print(f"   原始命令: {original_command}")
-                    print(f"   修正命令: {mcp_command}")
-                    print(f"   Python 解释器: {python_exe}")
-                    print(f"   (这确保使用 conda 虚拟环境的 Python 而不是系统 Python)")
+            # 使用我们创建的服务器
+            argv = _python_server_argv()
+            messages.append(f"   回退命令: {shlex.join(argv)}")
+        else:
+            messages.append(f"   ✅ 模块 '{module_name}' 存在")
+    
+    return tuple(argv), tuple(messages)
+
+
+def _is_python_server(parts: Tuple[str, ...]) -> bool:
+    """判断命令是否配置为 Python MCP 服务器（按命令的各个部分判断）"""
+    if not parts:
+        return False
+    
+    executable = parts[0]
+    if not Path(executable).name.lower().startswith("python"):
+        return False
+    return executable == sys.executable or any(
+        "python_mcp_server.py" in part or part.startswith("mcp.server")
+        for part in parts[1:]
+    )
+
+
+def check_environment_variables():
+    """检查环境变量配置"""
+    print("=" * 60)
+    print("4. 检查环境变量配置")
+    print("=" * 60)
+    
+    mcp_argv, messages = _resolve_mcp_command()
+    print("\n".join(messages))
     
     # 检查是否是 Python MCP 服务器
-    if "python" in mcp_command.lower() and ("python_mcp_server.py" in mcp_command or "mcp.server" in mcp_command or sys.executable in mcp_command):
+    if _is_python_server(mcp_argv):
         print("✅ 配置为 Python MCP 服务器")
     else:
         print("⚠️  配置可能不是 Python MCP 服务器")
-        print(f"   当前配置: {mcp_command}")
+        print(f"   当前配置: {shlex.join(mcp_argv)}")
         print("   建议使用: python examples/python_mcp_server.py")
     
-    return mcp_command
+    return mcp_argv
 
 
-async def test_connection(mcp_command: str):
+async def check_connection(mcp_argv: Tuple[str, ...]):
     """测试连接到 MCP 服务器"""
     print("=" * 60)
     print("5. 测试连接")
     print("=" * 60)
     
-    print(f"   服务器命令: {mcp_command}")
+    print(f"   服务器命令: {shlex.join(mcp_argv)}")
     print("   开始连接...")
     
-    client = MCPClient(
-        server_command=mcp_command,
-        transport="stdio"
-    )
-    
     start_time = time.time()
     
     try:
-        connected = await client.connect()
+        # 通过连接池获取客户端，同一服务器命令复用已建立的连接
+        client = await get_client_pool().checkout(mcp_argv)
         elapsed_time = time.time() - start_time
-        
-        if connected:
-            print(f"✅ 连接成功 (耗时: {elapsed_time:.2f} 秒)")
-            return client, True
-        else:
-            print(f"❌ 连接失败 (耗时: {elapsed_time:.2f} 秒)")
-            return None, False
-            
+        print(f"✅ 连接成功 (耗时: {elapsed_time:.2f} 秒)")
+        return client, True
+    
+    except ConnectionError:
+        elapsed_time = time.time() - start_time
+        print(f"❌ 连接失败 (耗时: {elapsed_time:.2f} 秒)")
+        return None, False
     except Exception as e:
         elapsed_time = time.time() - start_time
         print(f"❌ 连接异常 (耗时: {elapsed_time:.2f} 秒): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("连接异常")
         return None, False
 
 
@@ -242,7 +315,7 @@ async def test_list_tools(client: MCPClient):
     
     if not client or not client.connected:
         print("❌ 客户端未连接，无法测试工具发现")
-        return False
+        raise CheckFailed("客户端未连接")
     
     try:
         start_time = time.time()
@@ -251,7 +324,7 @@ async def test_list_tools(client: MCPClient):
         
         if not tools:
             print("❌ 未发现任何工具")
-            return False
+            raise CheckFailed("未发现任何工具")
         
         print(f"✅ 发现 {len(tools)} 个工具 (耗时: {elapsed_time:.2f} 秒)")
         print()
@@ -261,16 +334,15 @@ async def test_list_tools(client: MCPClient):
             description = tool.get('description', 'N/A')
             print(f"   {idx}. {name}")
             if description and description != 'N/A':
-                desc_preview = description[:60] + "..." if len(description) > 60 else description
+                desc_preview = _truncate(description, 60)
                 print(f"      描述: {desc_preview}")
         
-        return True
-        
+    except CheckFailed:
+        raise
     except Exception as e:
         print(f"❌ 获取工具列表失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        logger.exception("获取工具列表失败")
+        raise CheckFailed(f"获取工具列表失败: {e}") from e
 
 
 async def test_call_tool(client: MCPClient, tool_name: str, arguments: dict):
@@ -281,7 +353,7 @@ async def test_call_tool(client: MCPClient, tool_name: str, arguments: dict):
     
     if not client or not client.connected:
         print("❌ 客户端未连接，无法测试工具调用")
-        return False
+        raise CheckFailed("客户端未连接")
     
     try:
         print(f"   工具名称: {tool_name}")
@@ -296,14 +368,14 @@ async def test_call_tool(client: MCPClient, tool_name: str, arguments: dict):
             error_msg = result.get("error", "Unknown error")
             print(f"❌ 工具调用返回错误 (耗时: {elapsed_time:.2f} 秒)")
             print(f"   错误信息: {error_msg}")
-            return False
+            raise CheckFailed(f"工具 {tool_name} 调用返回错误: {error_msg}")
         
         print(f"✅ 工具调用成功 (耗时: {elapsed_time:.2f} 秒)")
         
         # 显示结果摘要
         if "text" in result:
             text = result["text"]
-            preview = text[:100] + "..." if len(text) > 100 else text
+            preview = _truncate(text, 100)
             print(f"   结果预览: {preview}")
             print(f"   结果长度: {len(text)} 字符")
         elif "content" in result:
@@ -313,18 +385,17 @@ async def test_call_tool(client: MCPClient, tool_name: str, arguments: dict):
                 first_item = result["content"][0]
                 if isinstance(first_item, dict) and first_item.get("type") == "text":
                     text = first_item.get("text", "")
-                    preview = text[:100] + "..." if len(text) > 100 else text
+                    preview = _truncate(text, 100)
                     print(f"   第一个内容项预览: {preview}")
         else:
             print(f"   结果: {result}")
         
-        return True
-        
+    except CheckFailed:
+        raise
     except Exception as e:
         print(f"❌ 工具调用失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        logger.exception("工具调用失败")
+        raise CheckFailed(f"工具调用失败: {e}") from e
 
 
 async def test_error_handling(client: MCPClient):
@@ -335,7 +406,7 @@ async def test_error_handling(client: MCPClient):
     
     if not client or not client.connected:
         print("❌ 客户端未连接，无法测试错误处理")
-        return False
+        raise CheckFailed("客户端未连接")
     
     # 测试1: 无效工具名称
     print("   测试1: 调用不存在的工具")
@@ -365,7 +436,19 @@ async def test_error_handling(client: MCPClient):
             print(f"   ✅ 正确抛出异常: {type(e).__name__}")
     
     print("✅ 错误处理测试完成")
-    return True
+
+
+async def test_resolve_windows_quoted_path(monkeypatch):
+    """测试解析带引号的 Windows 路径（路径中的空格和反斜杠原样保留）"""
+    server_path = r"C:\Program Files\mcp\python_mcp_server.py"
+    monkeypatch.setenv("MCP_SERVER_COMMAND", f'python "{server_path}"')
+    _resolve_mcp_command.cache_clear()
+    try:
+        mcp_argv, _ = _resolve_mcp_command()
+    finally:
+        _resolve_mcp_command.cache_clear()
+    
+    assert mcp_argv == (sys.executable, server_path)
 
 
 async def main():
@@ -405,11 +488,11 @@ async def main():
         return 1
     
     # 4. 检查环境变量
-    mcp_command = check_environment_variables()
+    mcp_argv = check_environment_variables()
     print()
     
     # 5. 测试连接
-    client, connected = await test_connection(mcp_command)
+    client, connected = await check_connection(mcp_argv)
     results["连接"] = connected
     print()
     
@@ -417,58 +500,47 @@ async def main():
         print("❌ 连接失败，无法继续测试")
         return 1
     
-    # 6. 测试工具发现
-    results["工具发现"] = await test_list_tools(client)
-    print()
-    
-    if not results["工具发现"]:
-        print("⚠️  未发现工具，跳过工具调用测试")
-        await client.disconnect()
-        return 0
-    
-    # 7. 测试工具调用
-    tools = client.get_tools()
-    tool_names = [t.get("name") for t in tools]
-    
-    # 测试 read_file 工具（如果可用）
-    if "read_file" in tool_names:
-        test_file = Path(__file__).parent.parent / "README.md"
-        if test_file.exists():
-            results["read_file工具"] = await test_call_tool(
-                client,
-                "read_file",
-                {"path": str(test_file)}
-            )
+    # 客户端在检测结束后归还连接池并断开（无论中途是否提前返回）
+    try:
+        # 6. 测试工具发现
+        results["工具发现"] = await _passed(test_list_tools(client))
+        print()
+        
+        if not results["工具发现"]:
+            print("⚠️  未发现工具，跳过工具调用测试")
+            return 0
+        
+        # 7. 测试工具调用
+        tool_names = frozenset(t.get("name") for t in client.get_tools())
+        
+        for tool_name, arguments in TOOL_TESTS.items():
+            result_key = f"{tool_name}工具"
+            if tool_name not in tool_names:
+                print(f"⚠️  {tool_name} 工具不可用，跳过测试")
+                results[result_key] = None
+                continue
+            
+            test_path = Path(arguments["path"])
+            if not test_path.exists():
+                print(f"⚠️  {test_path.name} 不存在，跳过 {tool_name} 测试")
+                results[result_key] = None
+                continue
+            
+            results[result_key] = await _passed(test_call_tool(client, tool_name, arguments))
             print()
-        else:
-            print("⚠️  README.md 不存在，跳过 read_file 测试")
-            results["read_file工具"] = None
-    else:
-        print("⚠️  read_file 工具不可用，跳过测试")
-        results["read_file工具"] = None
-    
-    # 测试 list_directory 工具（如果可用）
-    if "list_directory" in tool_names:
-        test_dir = str(Path(__file__).parent.parent)
-        results["list_directory工具"] = await test_call_tool(
-            client,
-            "list_directory",
-            {"path": test_dir}
-        )
+        
+        # 8. 测试错误处理
+        results["错误处理"] = await _passed(test_error_handling(client))
         print()
-    else:
-        print("⚠️  list_directory 工具不可用，跳过测试")
-        results["list_directory工具"] = None
-    
-    # 8. 测试错误处理
-    results["错误处理"] = await test_error_handling(client)
-    print()
-    
-    # 断开连接
-    print("=" * 60)
-    print("9. 断开连接")
-    print("=" * 60)
-    await client.disconnect()
+        
+        # 断开连接
+        print("=" * 60)
+        print("9. 断开连接")
+        print("=" * 60)
+    finally:
+        pool = get_client_pool()
+        await pool.checkin(mcp_argv)
+        await pool.close_all()
     print("✅ 已断开连接")
     print()
     
@@ -14,9 +14,8 @@ from src.gui.app import PCGUIAgentApp
 
 def main(page: ft.Page):
     """主函数"""
+    # 关闭窗口时应用会先调用 agent.close() 清理资源
     app = PCGUIAgentApp(page)
-    # Flet 会在应用退出时自动清理资源
-    # 如果需要特殊清理，可以在应用退出前处理
 
 
 if __name__ == "__main__":
@@ -2,9 +2,11 @@
 Agent执行器模块
 实现LLM实时指挥的逐步决策机制
 """
+import json
+import uuid
 from typing import List, Dict, Any, Optional
 from .types import (
-    Action, ActionResult, StepDecision, Context, Task, TaskStatus
+    Action, ActionResult, ActionType, StepDecision, Context, Task, TaskStatus
 )
 from .worker import Worker
 from .planner import Planner
@@ -12,10 +14,14 @@ from .reflector import Reflector
 from .error_handler import ErrorHandler
 from ..llm.ollama_client import OllamaClient
 from ..llm.prompt_templates import get_agent_step_prompt
+from ..tools.registry import get_registry
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 从LLM响应中解析JSON对象的解码器（raw_decode 会忽略对象之后的多余文本）
+_DECODER = json.JSONDecoder()
+
 
 class AgentExecutor:
     """Agent执行器 - LLM实时指挥模式"""
@@ -63,10 +69,6 @@ class AgentExecutor:
         logger.info(f"Starting agent-mode task execution: {goal}")
         
         # 创建任务对象
-        from .types import Task
-        import uuid
-        from datetime import datetime
-        
         task = Task(
             id=f"task_{uuid.uuid4().hex[:8]}",
             goal=goal,
@@ -83,18 +85,25 @@ class AgentExecutor:
         
         # 执行循环
         action_results: List[ActionResult] = []
+        # 失败动作计数，判断是否全部成功时无需遍历结果
+        failures = 0
+        context.action_results = action_results
         step_count = 0
         last_decision: Optional[StepDecision] = None
         
+        # 获取可用工具列表（注册表在任务执行期间通常不变，只在修订号变化时重新获取）
+        tool_registry = get_registry()
+        tools_revision = tool_registry.revision
+        available_tools = tool_registry.get_tools_list()
+        
         try:
             while step_count < self.max_steps:
                 step_count += 1
                 logger.info(f"Step {step_count}/{self.max_steps}: Planning next action...")
                 
-                # 获取可用工具列表
-                from ..tools.registry import get_registry
-                tool_registry = get_registry()
-                available_tools = tool_registry.get_tools_list()
+                if tool_registry.revision != tools_revision:
+                    tools_revision = tool_registry.revision
+                    available_tools = tool_registry.get_tools_list()
                 
                 # 调用LLM决定下一步
                 decision = await self._decide_next_step(
@@ -136,7 +145,6 @@ class AgentExecutor:
                     )
                     
                     action_results.append(result)
-                    context.action_results = action_results
                     
                     # 更新上下文变量
                     if result.success and result.data:
@@ -144,6 +152,7 @@ class AgentExecutor:
                     
                     # 如果动作失败，进行反思
                     if not result.success:
+                        failures += 1
                         logger.warning(f"Action failed: {result.message}")
                         # 可以在这里调用反思器分析失败原因
                 
@@ -151,7 +160,7 @@ class AgentExecutor:
                 last_decision = decision
                 
                 # 检查任务是否完成
-                if await self._check_task_complete(goal, context, action_results):
+                if await self._check_task_complete(goal, context, len(action_results), failures):
                     logger.info("Task completed successfully")
                     break
             
@@ -163,7 +172,7 @@ class AgentExecutor:
             )
             
             # 判断是否成功
-            all_success = all(r.success for r in action_results)
+            all_success = failures == 0
             task.status = TaskStatus.COMPLETED if all_success else TaskStatus.FAILED
             
             return {
@@ -175,7 +184,7 @@ class AgentExecutor:
             }
             
         except Exception as e:
-            logger.error(f"Agent execution error: {e}")
+            logger.exception("Agent execution error")
             task.status = TaskStatus.FAILED
             return {
                 "success": False,
@@ -243,19 +252,14 @@ class AgentExecutor:
         Returns:
             步骤决策对象
         """
-        import json
-        import re
-        
         try:
-            # 尝试提取JSON
-            json_str = self._extract_json_from_response(response)
-            decision_data = json.loads(json_str)
+            # 解析响应中的JSON对象
+            decision_data = self._decode_json_from_response(response)
             
             # 解析动作
             action = None
             if "action" in decision_data and decision_data["action"]:
                 action_data = decision_data["action"]
-                from .types import ActionType
                 
                 action_type_str = action_data.get("type", "gui")
                 try:
@@ -288,43 +292,34 @@ class AgentExecutor:
                 reasoning=f"解析决策响应失败: {str(e)}"
             )
     
-    def _extract_json_from_response(self, response: str) -> str:
+    def _decode_json_from_response(self, response: str) -> Dict[str, Any]:
         """
-        从响应中提取JSON字符串
+        从响应中解析JSON对象
+        
+        从第一个"{"开始直接解码，markdown代码块标记和对象之后的文本会被忽略
         
         Args:
             response: LLM响应文本
             
         Returns:
-            提取的JSON字符串
+            解析出的JSON对象
+            
+        Raises:
+            ValueError: 响应中没有JSON对象，或第一个"{"处的对象无法解码
         """
-        response = response.strip()
-        
-        # 查找markdown代码块
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            if end != -1:
-                return response[start:end].strip()
-        elif "```" in response:
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            if end != -1:
-                return response[start:end].strip()
-        
-        # 查找JSON对象
-        import re
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            return json_match.group(0)
+        start = response.find("{")
+        if start < 0:
+            raise ValueError("No JSON object found in response")
         
-        return response
+        obj, _ = _DECODER.raw_decode(response, start)
+        return obj
     
     async def _check_task_complete(
         self,
         goal: str,
         context: Context,
-        action_results: List[ActionResult]
+        action_count: int,
+        failures: int
     ) -> bool:
         """
         检查任务是否完成
@@ -332,17 +327,18 @@ class AgentExecutor:
         Args:
             goal: 用户目标
             context: 执行上下文
-            action_results: 动作执行结果列表
+            action_count: 已执行的动作数量
+            failures: 失败的动作数量
             
         Returns:
             任务是否完成
         """
         # 简单检查：如果所有动作都成功，认为任务完成
-        if not action_results:
+        if not action_count:
             return False
         
         # 可以添加更复杂的完成检查逻辑
         # 例如：调用LLM判断目标是否达成
         
-        return all(r.success for r in action_results)
+        return failures == 0
 
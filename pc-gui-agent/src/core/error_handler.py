@@ -2,12 +2,23 @@
 错误处理器模块
 提供错误分类、恢复策略和错误上下文记录
 """
+import functools
+import itertools
+import random
+import traceback
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, List, Optional, Any, Tuple
 from enum import Enum
 from datetime import datetime
 from ..utils.logger import get_logger
 
+# 安装了 pyahocorasick 时用 Aho-Corasick 自动机一次扫描匹配所有错误关键词，否则逐个关键词查找
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 logger = get_logger(__name__)
 
 
@@ -32,7 +43,75 @@ class RecoveryStrategy(str, Enum):
     MANUAL_INTERVENTION = "manual_intervention"  # 需要人工干预
 
 
-@dataclass
+# 异常类名到错误类型的映射（沿异常类的MRO查找，子类同样适用）
+_EXC_CLASS_MAP: Dict[str, ErrorType] = {
+    "TimeoutError": ErrorType.TIMEOUT,
+    "JSONDecodeError": ErrorType.JSON_PARSE_ERROR,
+    "PermissionError": ErrorType.PERMISSION_DENIED,
+    "ConnectionError": ErrorType.NETWORK_ERROR,
+}
+
+# 类名不在映射中时按类名包含的片段判断（第三方库的异常，如 ServerTimeoutError、ClientConnectionError）
+_EXC_NAME_PARTS = (
+    (ErrorType.TIMEOUT, ("Timeout", "timeout")),
+    (ErrorType.JSON_PARSE_ERROR, ("JSON", "json")),
+    (ErrorType.PERMISSION_DENIED, ("Permission", "Forbidden")),
+    (ErrorType.NETWORK_ERROR, ("Network", "Connection")),
+)
+
+
+# 错误上下文中保留的最大堆栈层数
+_STACK_TRACE_LIMIT = 20
+
+# 指数退避的延迟上限（秒）
+_MAX_RETRY_DELAY = 60.0
+
+# 指数退避倍数表（2 ^ retry_count），重试次数超出表长时取最后一项（任何正的基础延迟都早已达到上限）
+_BACKOFF_TABLE: Tuple[float, ...] = tuple(float(2 ** i) for i in range(64))
+
+# 各恢复策略的基础置信度
+_BASE_CONFIDENCE: Dict[RecoveryStrategy, float] = {
+    RecoveryStrategy.RETRY: 0.7,
+    RecoveryStrategy.SKIP: 0.5,
+    RecoveryStrategy.ABORT: 0.9,
+    RecoveryStrategy.FALLBACK: 0.6,
+    RecoveryStrategy.MANUAL_INTERVENTION: 0.3,
+}
+
+# 各恢复策略的恢复消息模板（error_type: 错误类型，attempt: 本次重试序号）
+_RECOVERY_MESSAGES: Dict[RecoveryStrategy, str] = {
+    RecoveryStrategy.RETRY: "检测到{error_type}错误，将重试（第{attempt}次）",
+    RecoveryStrategy.SKIP: "检测到{error_type}错误，跳过当前步骤",
+    RecoveryStrategy.ABORT: "检测到{error_type}错误，中止任务执行",
+    RecoveryStrategy.FALLBACK: "检测到{error_type}错误，使用备用方案",
+    RecoveryStrategy.MANUAL_INTERVENTION: "检测到{error_type}错误，需要人工干预",
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _classify_exception_type(exc_type: type) -> Optional[ErrorType]:
+    """
+    根据异常类判断错误类型（结果按异常类缓存）
+    
+    Args:
+        exc_type: 异常类
+        
+    Returns:
+        错误类型，无法根据异常类判断时返回None
+    """
+    for cls in exc_type.__mro__:
+        error_type = _EXC_CLASS_MAP.get(cls.__name__)
+        if error_type is not None:
+            return error_type
+    
+    type_name = exc_type.__name__
+    for error_type, name_parts in _EXC_NAME_PARTS:
+        if any(part in type_name for part in name_parts):
+            return error_type
+    return None
+
+
+@dataclass(slots=True)
 class ErrorContext:
     """错误上下文"""
     error_type: ErrorType
@@ -40,14 +119,24 @@ class ErrorContext:
     original_exception: Optional[Exception] = None
     action_id: Optional[str] = None
     tool_name: Optional[str] = None
-    args: Dict[str, Any] = field(default_factory=dict)
+    args: Optional[Dict[str, Any]] = None
     timestamp: datetime = field(default_factory=datetime.now)
     retry_count: int = 0
-    stack_trace: Optional[str] = None
-    additional_info: Dict[str, Any] = field(default_factory=dict)
+    additional_info: Optional[Dict[str, Any]] = None
+    _stack_trace: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    @property
+    def stack_trace(self) -> Optional[str]:
+        """异常堆栈（首次访问时才从原始异常格式化，最多保留 _STACK_TRACE_LIMIT 层）"""
+        if self._stack_trace is None and self.original_exception is not None:
+            error = self.original_exception
+            self._stack_trace = "".join(traceback.format_exception(
+                type(error), error, error.__traceback__, limit=_STACK_TRACE_LIMIT
+            ))
+        return self._stack_trace
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class RecoveryAction:
     """恢复动作"""
     strategy: RecoveryStrategy
@@ -74,6 +163,9 @@ class ErrorHandler:
         ErrorType.UNKNOWN_ERROR: RecoveryStrategy.MANUAL_INTERVENTION,
     }
     
+    # 错误历史最多保留的条数（超出后自动丢弃最早的记录）
+    HISTORY_CAP: int = 1024
+    
     # 错误关键词匹配规则
     ERROR_KEYWORDS: Dict[ErrorType, List[str]] = {
         ErrorType.TIMEOUT: ["timeout", "超时", "timed out", "time out"],
@@ -102,7 +194,54 @@ class ErrorHandler:
     
     def __init__(self):
         """初始化错误处理器"""
-        self.error_history: List[ErrorContext] = []
+        self.error_history: Deque[ErrorContext] = deque(maxlen=self.HISTORY_CAP)
+        if ahocorasick is not None:
+            self._keyword_automaton = self._build_keyword_automaton()
+        else:
+            self._flat_keywords = self._build_flat_keywords()
+    
+    @classmethod
+    def _build_flat_keywords(cls) -> Tuple[Tuple[str, ErrorType], ...]:
+        """
+        将错误关键词展开为 (关键词, 错误类型) 元组（每个类只构建一次）
+        
+        顺序与 ERROR_KEYWORDS 一致，依次查找时第一个命中的即为优先级最高的错误类型
+        
+        Returns:
+            (关键词, 错误类型) 元组
+        """
+        flat_keywords = cls.__dict__.get("_flat_keywords")
+        if flat_keywords is None:
+            flat_keywords = tuple(
+                (keyword.lower(), error_type)
+                for error_type, keywords in cls.ERROR_KEYWORDS.items()
+                for keyword in keywords
+            )
+            cls._flat_keywords = flat_keywords
+        return flat_keywords
+    
+    @classmethod
+    def _build_keyword_automaton(cls):
+        """
+        构建错误关键词的 Aho-Corasick 自动机（每个类只构建一次）
+        
+        关键词对应 (优先级, 错误类型)，优先级为错误类型在 ERROR_KEYWORDS 中的顺序
+        
+        Returns:
+            ahocorasick.Automaton 对象
+        """
+        automaton = cls.__dict__.get("_keyword_automaton")
+        if automaton is None:
+            automaton = ahocorasick.Automaton()
+            for priority, (error_type, keywords) in enumerate(cls.ERROR_KEYWORDS.items()):
+                for keyword in keywords:
+                    keyword = keyword.lower()
+                    # 同一关键词属于多个错误类型时保留排在前面的类型
+                    if keyword not in automaton:
+                        automaton.add_word(keyword, (priority, error_type))
+            automaton.make_automaton()
+            cls._keyword_automaton = automaton
+        return automaton
     
     def classify_error(
         self,
@@ -124,26 +263,21 @@ class ErrorHandler:
         error_msg = error_message or str(error)
         error_msg_lower = error_msg.lower()
         
-        # 检查错误类型
-        error_type_name = type(error).__name__
-        
         # 根据异常类型判断
-        if "Timeout" in error_type_name or "timeout" in error_type_name:
-            return ErrorType.TIMEOUT
-        
-        if "JSON" in error_type_name or "json" in error_type_name:
-            return ErrorType.JSON_PARSE_ERROR
-        
-        if "Permission" in error_type_name or "Forbidden" in error_type_name:
-            return ErrorType.PERMISSION_DENIED
-        
-        if "Network" in error_type_name or "Connection" in error_type_name:
-            return ErrorType.NETWORK_ERROR
-        
-        # 根据错误消息关键词匹配
-        for error_type, keywords in self.ERROR_KEYWORDS.items():
-            if any(keyword in error_msg_lower for keyword in keywords):
-                return error_type
+        error_type = _classify_exception_type(type(error))
+        if error_type is not None:
+            return error_type
+        
+        # 根据错误消息关键词匹配（多个类型的关键词同时出现时，按 ERROR_KEYWORDS 中的顺序取第一个）
+        if ahocorasick is not None:
+            matches = self._keyword_automaton.iter(error_msg_lower)
+            best_match = min((match for _, match in matches), default=None)
+            if best_match is not None:
+                return best_match[1]
+        else:
+            for keyword, error_type in self._flat_keywords:
+                if keyword in error_msg_lower:
+                    return error_type
         
         # 默认返回未知错误
         return ErrorType.UNKNOWN_ERROR
@@ -176,19 +310,15 @@ class ErrorHandler:
         if error_type is None:
             error_type = self.classify_error(error)
         
-        import traceback
-        stack_trace = traceback.format_exc()
-        
         error_context = ErrorContext(
             error_type=error_type,
             error_message=str(error),
             original_exception=error,
             action_id=action_id,
             tool_name=tool_name,
-            args=args or {},
+            args=args,
             retry_count=retry_count,
-            stack_trace=stack_trace,
-            additional_info=additional_info or {}
+            additional_info=additional_info
         )
         
         # 记录错误历史
@@ -213,11 +343,34 @@ class ErrorHandler:
         Returns:
             恢复动作
         """
-        error_type = error_context.error_type
-        retry_count = error_context.retry_count
+        # 达到最大重试次数后，恢复动作只取决于是否重试过，与具体次数无关，
+        # 因此将重试次数归并后作为缓存键
+        retry_count = min(error_context.retry_count, max(max_retries, 1))
+        return self._compute_recovery(error_context.error_type, retry_count, max_retries, retry_delay)
+    
+    @classmethod
+    @functools.lru_cache(maxsize=64)
+    def _compute_recovery(
+        cls,
+        error_type: ErrorType,
+        retry_count: int,
+        max_retries: int,
+        retry_delay: float
+    ) -> RecoveryAction:
+        """
+        计算恢复动作（结果按参数缓存，RecoveryAction 不可变，可直接共享）
         
+        Args:
+            error_type: 错误类型
+            retry_count: 已重试次数
+            max_retries: 最大重试次数
+            retry_delay: 重试延迟（秒）
+            
+        Returns:
+            恢复动作
+        """
         # 获取默认恢复策略
-        default_strategy = self.ERROR_RECOVERY_MAP.get(
+        default_strategy = cls.ERROR_RECOVERY_MAP.get(
             error_type,
             RecoveryStrategy.MANUAL_INTERVENTION
         )
@@ -238,10 +391,10 @@ class ErrorHandler:
         )
         
         # 计算置信度
-        confidence = self._calculate_confidence(error_context, default_strategy)
+        confidence = cls._calculate_confidence(error_type, retry_count, default_strategy)
         
         # 生成恢复消息
-        message = self._generate_recovery_message(error_context, default_strategy)
+        message = cls._generate_recovery_message(error_type, retry_count, default_strategy)
         
         return RecoveryAction(
             strategy=default_strategy,
@@ -252,32 +405,27 @@ class ErrorHandler:
             confidence=confidence
         )
     
+    @staticmethod
     def _calculate_confidence(
-        self,
-        error_context: ErrorContext,
+        error_type: ErrorType,
+        retry_count: int,
         strategy: RecoveryStrategy
     ) -> float:
         """
         计算恢复策略的置信度
         
         Args:
-            error_context: 错误上下文
+            error_type: 错误类型
+            retry_count: 已重试次数
             strategy: 恢复策略
             
         Returns:
             置信度 (0-1)
         """
         # 基础置信度
-        base_confidence = {
-            RecoveryStrategy.RETRY: 0.7,
-            RecoveryStrategy.SKIP: 0.5,
-            RecoveryStrategy.ABORT: 0.9,
-            RecoveryStrategy.FALLBACK: 0.6,
-            RecoveryStrategy.MANUAL_INTERVENTION: 0.3,
-        }.get(strategy, 0.5)
+        base_confidence = _BASE_CONFIDENCE.get(strategy, 0.5)
         
         # 根据错误类型调整
-        error_type = error_context.error_type
         if error_type in [ErrorType.TIMEOUT, ErrorType.NETWORK_ERROR]:
             # 网络和超时错误，重试的置信度较高
             if strategy == RecoveryStrategy.RETRY:
@@ -288,39 +436,38 @@ class ErrorHandler:
                 base_confidence = 0.95
         
         # 根据重试次数调整
-        if error_context.retry_count > 0:
+        if retry_count > 0:
             # 已经重试过，置信度降低
             base_confidence *= 0.9
         
         return min(1.0, max(0.0, base_confidence))
     
+    @staticmethod
     def _generate_recovery_message(
-        self,
-        error_context: ErrorContext,
+        error_type: ErrorType,
+        retry_count: int,
         strategy: RecoveryStrategy
     ) -> str:
         """
         生成恢复消息
         
         Args:
-            error_context: 错误上下文
+            error_type: 错误类型
+            retry_count: 已重试次数
             strategy: 恢复策略
             
         Returns:
             恢复消息
         """
-        error_type = error_context.error_type
-        retry_count = error_context.retry_count
-        
-        messages = {
-            RecoveryStrategy.RETRY: f"检测到{error_type.value}错误，将重试（第{retry_count + 1}次）",
-            RecoveryStrategy.SKIP: f"检测到{error_type.value}错误，跳过当前步骤",
-            RecoveryStrategy.ABORT: f"检测到{error_type.value}错误，中止任务执行",
-            RecoveryStrategy.FALLBACK: f"检测到{error_type.value}错误，使用备用方案",
-            RecoveryStrategy.MANUAL_INTERVENTION: f"检测到{error_type.value}错误，需要人工干预",
-        }
-        
-        return messages.get(strategy, "未知错误，需要处理")
+        template = _RECOVERY_MESSAGES.get(strategy)
+        if template is None:
+            return "未知错误，需要处理"
+        
+        # 只格式化选中的消息模板
+        return template.format(
+            error_type=error_type.value,
+            attempt=retry_count + 1
+        )
     
     def should_retry(
         self,
@@ -347,7 +494,8 @@ class ErrorHandler:
         self,
         error_context: ErrorContext,
         base_delay: float = 1.0,
-        use_exponential_backoff: bool = True
+        use_exponential_backoff: bool = True,
+        jitter: float = 0.0
     ) -> float:
         """
         获取重试延迟（支持指数退避）
@@ -356,6 +504,7 @@ class ErrorHandler:
             error_context: 错误上下文
             base_delay: 基础延迟（秒）
             use_exponential_backoff: 是否使用指数退避
+            jitter: 随机抖动比例（如0.1表示额外增加0~10%的延迟，避免多个任务同时重试）
             
         Returns:
             重试延迟（秒）
@@ -363,12 +512,14 @@ class ErrorHandler:
         if not use_exponential_backoff:
             return base_delay
         
-        # 指数退避：delay = base_delay * (2 ^ retry_count)
-        retry_count = error_context.retry_count
-        delay = base_delay * (2 ** retry_count)
+        # 指数退避：delay = base_delay * (2 ^ retry_count)，倍数查表获得
+        retry_count = min(error_context.retry_count, len(_BACKOFF_TABLE) - 1)
+        delay = base_delay * _BACKOFF_TABLE[retry_count]
+        if jitter:
+            delay += random.random() * delay * jitter
         
         # 最大延迟限制为60秒
-        return min(delay, 60.0)
+        return min(delay, _MAX_RETRY_DELAY)
     
     def get_error_summary(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -380,7 +531,8 @@ class ErrorHandler:
         Returns:
             错误摘要列表
         """
-        recent_errors = self.error_history[-limit:]
+        history_size = len(self.error_history)
+        recent_errors = itertools.islice(self.error_history, max(0, history_size - limit), history_size)
         
         return [
             {
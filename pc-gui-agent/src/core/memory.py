@@ -1,6 +1,9 @@
 """
 记忆模块
 """
+import asyncio
+import dataclasses
+import time
 import aiosqlite
 import json
 from typing import List, Optional, Dict, Any
@@ -11,6 +14,142 @@ from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 优先使用 orjson（C扩展）序列化记忆内容，未安装时回退到标准库 json
+# 两者都把数据类序列化为字段字典、把时间序列化为ISO字符串
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    _loads = orjson.loads
+except ImportError:
+    def _json_default(obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            return dataclasses.asdict(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False, default=_json_default)
+
+    _loads = json.loads
+
+# 表结构（时间列以整数微秒时间戳存储，比ISO字符串占用更少、比较更快）
+_TABLE_COLUMNS = {
+    # 任务记忆表
+    "task_memories": """
+        id TEXT PRIMARY KEY,
+        task_id TEXT NOT NULL,
+        task_goal TEXT NOT NULL,
+        task_result TEXT NOT NULL,
+        reflection TEXT,
+        tool_usage TEXT,
+        created_at INTEGER NOT NULL
+    """,
+    # 工具使用记录表
+    "tool_usage": """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tool_name TEXT NOT NULL,
+        success INTEGER NOT NULL,
+        execution_time REAL NOT NULL,
+        error TEXT,
+        timestamp INTEGER NOT NULL
+    """,
+}
+
+# 各表的时间列
+_TIMESTAMP_COLUMNS = {
+    "task_memories": "created_at",
+    "tool_usage": "timestamp",
+}
+
+
+# 连接的预编译语句缓存容量（sqlite3 默认128）
+_CACHED_STATEMENTS = 256
+
+# 常用查询语句（保持字符串不变，连接的语句缓存可复用已编译的语句）
+
+# 存储任务记忆：使用 UPSERT 而不是 INSERT OR REPLACE，REPLACE 删除旧记录时不会触发删除触发器，
+# 全文索引中会残留旧记录
+_SQL_UPSERT_TASK = """
+    INSERT INTO task_memories 
+    (id, task_id, task_goal, task_result, reflection, tool_usage, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        task_id = excluded.task_id,
+        task_goal = excluded.task_goal,
+        task_result = excluded.task_result,
+        reflection = excluded.reflection,
+        tool_usage = excluded.tool_usage,
+        created_at = excluded.created_at
+"""
+
+# 全文索引检索：任一关键词命中即可，按相关度排序
+_SQL_SEARCH_FTS = """
+    SELECT task_memories.* FROM task_goals_fts
+    JOIN task_memories ON task_memories.id = task_goals_fts.memory_id
+    WHERE task_goals_fts MATCH ?
+    ORDER BY task_goals_fts.rank, task_memories.created_at DESC
+    LIMIT ?
+"""
+
+# LIKE检索（不支持全文索引或关键词过短时使用）
+_SQL_SEARCH_LIKE = """
+    SELECT * FROM task_memories
+    WHERE task_goal LIKE ?
+    ORDER BY created_at DESC
+    LIMIT ?
+"""
+
+# 存储工具使用记录
+_SQL_INSERT_TOOL_USAGE = """
+    INSERT INTO tool_usage 
+    (tool_name, success, execution_time, error, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# 单个工具的统计信息
+_SQL_TOOL_STATS = """
+    SELECT 
+        COUNT(*) as total,
+        SUM(success) as success_count,
+        AVG(execution_time) as avg_time
+    FROM tool_usage
+    WHERE tool_name = ?
+"""
+
+# 所有工具的统计信息
+_SQL_ALL_TOOL_STATS = """
+    SELECT 
+        tool_name,
+        COUNT(*) as total,
+        SUM(success) as success_count,
+        AVG(execution_time) as avg_time
+    FROM tool_usage
+    GROUP BY tool_name
+"""
+
+# 指定任务最新的工作记忆
+_SQL_WORK_MEMORY = """
+    SELECT task_result, reflection, tool_usage
+    FROM task_memories
+    WHERE task_id = ?
+    ORDER BY created_at DESC
+    LIMIT 1
+"""
+
+
+def _datetime_to_micros(value: datetime) -> int:
+    """将时间转换为整数微秒时间戳"""
+    return round(value.timestamp() * 1_000_000)
+
+
+def _micros_to_datetime(value: int) -> datetime:
+    """将整数微秒时间戳转换为本地时间"""
+    return datetime.fromtimestamp(value / 1_000_000)
+
 
 class Memory:
     """记忆模块"""
@@ -23,6 +162,11 @@ class Memory:
             database_path: 数据库路径
         """
         self.database_path = database_path
+        self._db: Optional[aiosqlite.Connection] = None
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        # 任务目标全文索引是否可用（initialize 中创建成功后启用）
+        self._fts_enabled = False
         self._ensure_db_dir()
     
     def _ensure_db_dir(self) -> None:
@@ -30,36 +174,142 @@ class Memory:
         db_path = Path(self.database_path)
         db_path.parent.mkdir(parents=True, exist_ok=True)
     
+    async def _get_db(self) -> aiosqlite.Connection:
+        """
+        获取长期复用的数据库连接（首次使用时建立）
+        
+        Returns:
+            数据库连接
+        """
+        if self._db is None:
+            async with self._connect_lock:
+                if self._db is None:
+                    # 扩大语句缓存，重复执行的查询无需重新解析和生成执行计划
+                    db = await aiosqlite.connect(
+                        self.database_path, cached_statements=_CACHED_STATEMENTS
+                    )
+                    # WAL模式下 NORMAL 同步级别仍能保证数据库一致，且提交时无需每次fsync
+                    await db.execute("PRAGMA synchronous=NORMAL")
+                    self._db = db
+        return self._db
+    
+    async def close(self) -> None:
+        """关闭数据库连接"""
+        if self._db is not None:
+            db, self._db = self._db, None
+            await db.close()
+    
     async def initialize(self) -> None:
         """初始化数据库"""
-        async with aiosqlite.connect(self.database_path) as db:
-            # 任务记忆表
+        db = await self._get_db()
+        async with self._write_lock:
+            # WAL模式下写入不阻塞读取，提交时也无需每次重写回滚日志（该设置保存在数据库文件中）
+            await db.execute("PRAGMA journal_mode=WAL")
+            
+            for table, columns in _TABLE_COLUMNS.items():
+                await db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+                await self._migrate_timestamp_column(db, table)
+            
+            # 按工具统计和按任务查询最新工作记忆使用的索引
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tool_usage_name ON tool_usage (tool_name)"
+            )
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_task_memories_task_created "
+                "ON task_memories (task_id, created_at DESC)"
+            )
+            
+            await self._create_goal_index(db)
+            
+            await db.commit()
+            logger.info("Memory database initialized")
+    
+    async def _migrate_timestamp_column(self, db: aiosqlite.Connection, table: str) -> None:
+        """
+        将旧版本以ISO字符串存储时间的表迁移为整数微秒时间戳
+        
+        SQLite 无法修改列类型（TEXT 列会把写入的整数转换为字符串），因此重建该表
+        
+        Args:
+            db: 数据库连接
+            table: 表名
+        """
+        column = _TIMESTAMP_COLUMNS[table]
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            declared_types = {row[1]: row[2] for row in await cursor.fetchall()}
+        if declared_types.get(column, "").upper() == "INTEGER":
+            return
+        
+        async with db.execute(f"SELECT * FROM {table}") as cursor:
+            names = [description[0] for description in cursor.description]
+            rows = await cursor.fetchall()
+        index = names.index(column)
+        converted_rows = [
+            row[:index] + (_datetime_to_micros(datetime.fromisoformat(row[index])),) + row[index + 1:]
+            for row in rows
+        ]
+        
+        # 在同一个事务中重建表（表上的索引和触发器随旧表删除，之后重新创建）
+        await db.execute("BEGIN")
+        await db.execute(f"DROP TABLE {table}")
+        await db.execute(f"CREATE TABLE {table} ({_TABLE_COLUMNS[table]})")
+        await db.executemany(
+            f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            converted_rows
+        )
+        await db.commit()
+        logger.info(f"Migrated {len(converted_rows)} rows in {table} to integer timestamps")
+    
+    async def _create_goal_index(self, db: aiosqlite.Connection) -> None:
+        """
+        创建任务目标的 FTS5 全文索引，并用触发器与 task_memories 保持同步
+        
+        使用 trigram 分词器，支持中文等不以空格分词的目标按子串检索；
+        SQLite 不支持 FTS5 或 trigram 分词器时，检索回退到 LIKE 查询
+        
+        Args:
+            db: 数据库连接
+        """
+        async with db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_goals_fts'"
+        ) as cursor:
+            index_exists = await cursor.fetchone() is not None
+        
+        try:
             await db.execute("""
-                CREATE TABLE IF NOT EXISTS task_memories (
-                    id TEXT PRIMARY KEY,
-                    task_id TEXT NOT NULL,
-                    task_goal TEXT NOT NULL,
-                    task_result TEXT NOT NULL,
-                    reflection TEXT,
-                    tool_usage TEXT,
-                    created_at TEXT NOT NULL
-                )
+                CREATE VIRTUAL TABLE IF NOT EXISTS task_goals_fts
+                USING fts5(memory_id UNINDEXED, task_goal, tokenize='trigram')
             """)
+        except aiosqlite.OperationalError as e:
+            logger.warning(f"FTS5 index unavailable, falling back to LIKE search: {e}")
+            return
+        
+        await db.executescript("""
+            CREATE TRIGGER IF NOT EXISTS task_memories_fts_insert
+            AFTER INSERT ON task_memories BEGIN
+                INSERT INTO task_goals_fts (memory_id, task_goal) VALUES (new.id, new.task_goal);
+            END;
+            
+            CREATE TRIGGER IF NOT EXISTS task_memories_fts_update
+            AFTER UPDATE OF task_goal ON task_memories BEGIN
+                DELETE FROM task_goals_fts WHERE memory_id = old.id;
+                INSERT INTO task_goals_fts (memory_id, task_goal) VALUES (new.id, new.task_goal);
+            END;
             
-            # 工具使用记录表
+            CREATE TRIGGER IF NOT EXISTS task_memories_fts_delete
+            AFTER DELETE ON task_memories BEGIN
+                DELETE FROM task_goals_fts WHERE memory_id = old.id;
+            END;
+        """)
+        
+        # 新建索引时补充已有的任务记忆
+        if not index_exists:
             await db.execute("""
-                CREATE TABLE IF NOT EXISTS tool_usage (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tool_name TEXT NOT NULL,
-                    success INTEGER NOT NULL,
-                    execution_time REAL NOT NULL,
-                    error TEXT,
-                    timestamp TEXT NOT NULL
-                )
+                INSERT INTO task_goals_fts (memory_id, task_goal)
+                SELECT id, task_goal FROM task_memories
             """)
-            
-            await db.commit()
-            logger.info("Memory database initialized")
+        
+        self._fts_enabled = True
     
     async def store_task(
         self,
@@ -77,33 +327,23 @@ class Memory:
             reflection: 反思结果（可选）
             tool_usage: 工具使用记录（可选）
         """
-        tool_usage_list = [
-            {
-                "tool_name": tu.tool_name,
-                "success": tu.success,
-                "execution_time": tu.execution_time,
-                "error": tu.error,
-                "timestamp": tu.timestamp.isoformat()
-            }
-            for tu in (tool_usage or [])
-        ]
+        # 序列化和日志输出都放在写锁之外，写锁只覆盖数据库写入，不阻塞其他写入者
+        params = (
+            f"memory_{task.id}",
+            task.id,
+            task.goal,
+            _dumps(task_result),
+            _dumps(reflection) if reflection else None,
+            # 工具使用记录直接序列化，无需先逐条转换为字典
+            _dumps(tool_usage or []),
+            time.time_ns() // 1000
+        )
         
-        async with aiosqlite.connect(self.database_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO task_memories 
-                (id, task_id, task_goal, task_result, reflection, tool_usage, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                f"memory_{task.id}",
-                task.id,
-                task.goal,
-                json.dumps(task_result, ensure_ascii=False),
-                json.dumps(reflection, ensure_ascii=False) if reflection else None,
-                json.dumps(tool_usage_list, ensure_ascii=False),
-                datetime.now().isoformat()
-            ))
+        db = await self._get_db()
+        async with self._write_lock:
+            await db.execute(_SQL_UPSERT_TASK, params)
             await db.commit()
-            logger.info(f"Stored task memory: {task.id}")
+        logger.info("Stored task memory: %s", task.id)
     
     async def retrieve_similar_tasks(
         self,
@@ -120,37 +360,41 @@ class Memory:
         Returns:
             相似任务记忆列表
         """
-        async with aiosqlite.connect(self.database_path) as db:
-            # 简单的关键词匹配（后续可以改进为向量相似度）
-            keywords = goal.lower().split()
-            
-            query = """
-                SELECT * FROM task_memories
-                WHERE task_goal LIKE ?
-                ORDER BY created_at DESC
-                LIMIT ?
-            """
+        db = await self._get_db()
+        # 关键词匹配（后续可以改进为向量相似度）
+        keywords = goal.lower().split()
+        
+        # trigram 分词器只能检索不少于3个字符的关键词，包含更短的关键词时使用LIKE查询
+        if self._fts_enabled and keywords and all(len(keyword) >= 3 for keyword in keywords):
+            query = _SQL_SEARCH_FTS
+            match_query = " OR ".join(
+                '"' + keyword.replace('"', '""') + '"' for keyword in keywords
+            )
+            params = (match_query, limit)
+        else:
+            query = _SQL_SEARCH_LIKE
             
             # 构建LIKE查询（简单实现）
             like_pattern = f"%{keywords[0]}%" if keywords else "%"
+            params = (like_pattern, limit)
+        
+        async with db.execute(query, params) as cursor:
+            rows = await cursor.fetchall()
             
-            async with db.execute(query, (like_pattern, limit)) as cursor:
-                rows = await cursor.fetchall()
-                
-                memories = []
-                for row in rows:
-                    memory = MemoryEntry(
-                        id=row[0],
-                        task_id=row[1],
-                        task_goal=row[2],
-                        task_result=json.loads(row[3]),
-                        reflection=json.loads(row[4]) if row[4] else None,
-                        tool_usage=json.loads(row[5]) if row[5] else [],
-                        created_at=datetime.fromisoformat(row[6])
-                    )
-                    memories.append(memory)
-                
-                return memories
+            memories = []
+            for row in rows:
+                memory = MemoryEntry(
+                    id=row[0],
+                    task_id=row[1],
+                    task_goal=row[2],
+                    task_result=_loads(row[3]),
+                    reflection=_loads(row[4]) if row[4] else None,
+                    tool_usage=_loads(row[5]) if row[5] else [],
+                    created_at=_micros_to_datetime(row[6])
+                )
+                memories.append(memory)
+            
+            return memories
     
     async def store_tool_usage(self, tool_usage: ToolUsage) -> None:
         """
@@ -159,18 +403,30 @@ class Memory:
         Args:
             tool_usage: 工具使用记录
         """
-        async with aiosqlite.connect(self.database_path) as db:
-            await db.execute("""
-                INSERT INTO tool_usage 
-                (tool_name, success, execution_time, error, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                tool_usage.tool_name,
-                1 if tool_usage.success else 0,
-                tool_usage.execution_time,
-                tool_usage.error,
-                tool_usage.timestamp.isoformat()
-            ))
+        await self.store_tool_usages([tool_usage])
+    
+    async def store_tool_usages(self, tool_usages: List[ToolUsage]) -> None:
+        """
+        批量存储工具使用记录（同一个连接内插入，只提交一次）
+        
+        Args:
+            tool_usages: 工具使用记录列表
+        """
+        if not tool_usages:
+            return
+        
+        db = await self._get_db()
+        async with self._write_lock:
+            await db.executemany(_SQL_INSERT_TOOL_USAGE, [
+                (
+                    tool_usage.tool_name,
+                    1 if tool_usage.success else 0,
+                    tool_usage.execution_time,
+                    tool_usage.error,
+                    _datetime_to_micros(tool_usage.timestamp)
+                )
+                for tool_usage in tool_usages
+            ])
             await db.commit()
     
     async def get_tool_stats(self, tool_name: Optional[str] = None) -> Dict[str, Any]:
@@ -183,49 +439,32 @@ class Memory:
         Returns:
             统计信息
         """
-        async with aiosqlite.connect(self.database_path) as db:
-            if tool_name:
-                query = """
-                    SELECT 
-                        COUNT(*) as total,
-                        SUM(success) as success_count,
-                        AVG(execution_time) as avg_time
-                    FROM tool_usage
-                    WHERE tool_name = ?
-                """
-                async with db.execute(query, (tool_name,)) as cursor:
-                    row = await cursor.fetchone()
-                    if row and row[0]:
-                        return {
-                            "tool_name": tool_name,
-                            "total": row[0],
-                            "success_count": row[1],
-                            "success_rate": row[1] / row[0] if row[0] > 0 else 0,
-                            "avg_execution_time": row[2]
-                        }
-            else:
-                query = """
-                    SELECT 
-                        tool_name,
-                        COUNT(*) as total,
-                        SUM(success) as success_count,
-                        AVG(execution_time) as avg_time
-                    FROM tool_usage
-                    GROUP BY tool_name
-                """
-                async with db.execute(query) as cursor:
-                    rows = await cursor.fetchall()
-                    stats = {}
-                    for row in rows:
-                        stats[row[0]] = {
-                            "total": row[1],
-                            "success_count": row[2],
-                            "success_rate": row[2] / row[1] if row[1] > 0 else 0,
-                            "avg_execution_time": row[3]
-                        }
-                    return stats
-            
-            return {}
+        db = await self._get_db()
+        if tool_name:
+            async with db.execute(_SQL_TOOL_STATS, (tool_name,)) as cursor:
+                row = await cursor.fetchone()
+                if row and row[0]:
+                    return {
+                        "tool_name": tool_name,
+                        "total": row[0],
+                        "success_count": row[1],
+                        "success_rate": row[1] / row[0] if row[0] > 0 else 0,
+                        "avg_execution_time": row[2]
+                    }
+        else:
+            async with db.execute(_SQL_ALL_TOOL_STATS) as cursor:
+                rows = await cursor.fetchall()
+                stats = {}
+                for row in rows:
+                    stats[row[0]] = {
+                        "total": row[1],
+                        "success_count": row[2],
+                        "success_rate": row[2] / row[1] if row[1] > 0 else 0,
+                        "avg_execution_time": row[3]
+                    }
+                return stats
+        
+        return {}
     
     async def get_work_memory(self, task_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -237,20 +476,14 @@ class Memory:
         Returns:
             工作记忆字典
         """
-        async with aiosqlite.connect(self.database_path) as db:
-            async with db.execute("""
-                SELECT task_result, reflection, tool_usage
-                FROM task_memories
-                WHERE task_id = ?
-                ORDER BY created_at DESC
-                LIMIT 1
-            """, (task_id,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return {
-                        "task_result": json.loads(row[0]),
-                        "reflection": json.loads(row[1]) if row[1] else None,
-                        "tool_usage": json.loads(row[2]) if row[2] else []
-                    }
-                return None
+        db = await self._get_db()
+        async with db.execute(_SQL_WORK_MEMORY, (task_id,)) as cursor:
+            row = await cursor.fetchone()
+            if row:
+                return {
+                    "task_result": _loads(row[0]),
+                    "reflection": _loads(row[1]) if row[1] else None,
+                    "tool_usage": _loads(row[2]) if row[2] else []
+                }
+            return None
 
@@ -20,6 +20,12 @@ from ..utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+def _tool_name_from_action_id(action_id: str) -> str:
+    """从动作ID（如 "step_1_navigate"）中取出最后一段作为工具名称"""
+    _, separator, tool_name = action_id.rpartition("_")
+    return tool_name if separator else "unknown"
+
+
 class Orchestrator:
     """协调器"""
     
@@ -124,18 +130,7 @@ class Orchestrator:
         result = await self.workflow_executor.execute_workflow(workflow, goal)
         
         # 存储记忆
-        if result.get("action_results"):
-            tool_usages = [
-                ToolUsage(
-                    tool_name=r.action_id.split("_")[-1] if "_" in r.action_id else "unknown",
-                    success=r.success,
-                    execution_time=r.execution_time,
-                    error=r.error
-                )
-                for r in result["action_results"]
-            ]
-            for tool_usage in tool_usages:
-                await self.memory.store_tool_usage(tool_usage)
+        await self._store_memory(goal, result)
         
         return result
     
@@ -161,42 +156,59 @@ class Orchestrator:
         result = await self.agent_executor.execute_task(goal)
         
         # 存储记忆
-        if result.get("action_results"):
-            tool_usages = [
-                ToolUsage(
-                    tool_name=r.action_id.split("_")[-1] if "_" in r.action_id else "unknown",
-                    success=r.success,
-                    execution_time=r.execution_time,
-                    error=r.error
-                )
-                for r in result["action_results"]
-            ]
-            for tool_usage in tool_usages:
-                await self.memory.store_tool_usage(tool_usage)
+        await self._store_memory(goal, result)
         
         return result
     
-    def _check_dependencies(
-        self,
-        subtask,
-        all_subtasks: List
-    ) -> bool:
+    async def _store_memory(self, goal: str, result: Dict[str, Any]) -> None:
         """
-        检查子任务依赖是否满足
+        存储任务记忆
+        
+        工具使用记录随任务记忆以JSON一次写入；启用 collect_tool_stats 时
+        再批量写入工具使用统计表
         
         Args:
-            subtask: 当前子任务
-            all_subtasks: 所有子任务列表
-            
-        Returns:
-            依赖是否满足
+            goal: 用户目标
+            result: 执行结果
         """
-        if not subtask.dependencies:
-            return True
+        if not result.get("action_results"):
+            return
+        
+        tool_usages = [
+            ToolUsage(
+                tool_name=_tool_name_from_action_id(r.action_id),
+                success=r.success,
+                execution_time=r.execution_time,
+                error=r.error
+            )
+            for r in result["action_results"]
+        ]
+        
+        success = bool(result.get("success"))
+        task = Task(
+            id=f"task_{uuid.uuid4().hex[:8]}",
+            goal=goal,
+            subtasks=[],
+            status=TaskStatus.COMPLETED if success else TaskStatus.FAILED
+        )
+        task_result = {
+            key: result[key]
+            for key in ("success", "error", "step_count", "executed_steps")
+            if key in result
+        }
+        
+        reflection = result.get("reflection")
+        reflection_data = {
+            "success": reflection.success,
+            "analysis": reflection.analysis,
+            "suggestions": reflection.suggestions,
+            "needs_replan": reflection.needs_replan,
+            "confidence": reflection.confidence
+        } if reflection else None
         
-        # 检查依赖的子任务是否已完成
-        completed_ids = {st.id for st in all_subtasks if st.status == TaskStatus.COMPLETED}
-        return all(dep_id in completed_ids for dep_id in subtask.dependencies)
+        await self.memory.store_task(task, task_result, reflection_data, tool_usages)
+        if self.config.collect_tool_stats:
+            await self.memory.store_tool_usages(tool_usages)
     
     async def pause_task(self, task_id: str) -> bool:
         """
@@ -224,13 +236,12 @@ class Orchestrator:
         Returns:
             是否成功
         """
-        if task_id in self._running_tasks:
-            task = self._running_tasks[task_id]
-            task.status = TaskStatus.CANCELLED
-            del self._running_tasks[task_id]
-            logger.info(f"Cancelled task: {task_id}")
-            return True
-        return False
+        task = self._running_tasks.pop(task_id, None)
+        if task is None:
+            return False
+        task.status = TaskStatus.CANCELLED
+        logger.info(f"Cancelled task: {task_id}")
+        return True
     
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -242,13 +253,13 @@ class Orchestrator:
         Returns:
             任务状态信息
         """
-        if task_id in self._running_tasks:
-            task = self._running_tasks[task_id]
-            return {
-                "id": task.id,
-                "status": task.status.value,
-                "goal": task.goal,
-                "subtasks_count": len(task.subtasks)
-            }
-        return None
+        task = self._running_tasks.get(task_id)
+        if task is None:
+            return None
+        return {
+            "id": task.id,
+            "status": task.status.value,
+            "goal": task.goal,
+            "subtasks_count": len(task.subtasks)
+        }
 
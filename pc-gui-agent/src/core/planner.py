@@ -1,19 +1,150 @@
 """
 规划器模块
 """
+import asyncio
 import json
 import uuid
 import re
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Union
 from .types import Task, Subtask, Action, ActionType, ExecutionPlan
 from .error_handler import ErrorHandler, ErrorType
 from ..llm.ollama_client import OllamaClient
-from ..llm.prompt_templates import get_planning_prompt
+from ..llm.prompt_templates import get_planning_prompt, render_tools_text
 from ..tools.registry import ToolRegistry, get_registry
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 优先使用 orjson（C扩展）快速解析格式正确的 JSON，未安装时回退到标准库 json
+# （orjson 的解析错误同样是 json.JSONDecodeError 的子类）
+try:
+    import orjson
+    _fast_json_loads = orjson.loads
+except ImportError:
+    _fast_json_loads = json.loads
+
+# JSON 清理使用的词法单元（连同其前面的空白）：一次扫描即可切分整个字符串，各分支均为线性匹配
+_JSON_TOKEN_RE = re.compile(r"""
+    \s*
+    (?:
+        (?P<string>"[^"\\]*(?:\\.[^"\\]*)*")                   # 双引号字符串
+        | (?P<single>'[^'\\]*(?:\\.[^'\\]*)*')                 # 单引号字符串
+        | (?P<comment>//[^\n]*|/\*.*?\*/)                       # 行注释、块注释
+        | (?P<value>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|(?:true|false|null)\b)  # 数字、布尔值、null
+        | (?P<open>[{\[])
+        | (?P<close>[}\]])
+        | (?P<word>\w+)
+        | (?P<other>.)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+# 可以作为值开头的词法单元（前一个单元是值的结尾时说明缺少逗号）
+_VALUE_START_TOKENS = frozenset(("string", "single", "value", "open"))
+
+# 可以作为值结尾的词法单元
+_VALUE_END_TOKENS = frozenset(("string", "single", "value", "close"))
+
+# 单引号字符串中的转义序列和未转义的双引号
+_SINGLE_QUOTED_ESCAPE_RE = re.compile(r'\\(.)|"', re.DOTALL)
+
+# 花括号（提取 JSON 对象时在 UTF-8 字节上配对使用）
+_BRACE_RE = re.compile(rb'[{}]')
+
+# 动作类型字符串 -> ActionType（未知类型默认使用GUI）
+_ACTION_TYPES = {action_type.value: action_type for action_type in ActionType}
+
+# 解析结果缓存的最大条目数（相同的响应文本直接复用解析结果）
+_PARSE_CACHE_SIZE = 32
+
+# 部分解析：subtasks 数组的开头
+_SUBTASKS_ARRAY_START_RE = re.compile(r'"subtasks"\s*:\s*\[')
+
+# 部分解析：字符串（其中的括号不参与配对）和括号
+_BRACKET_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]]', re.DOTALL)
+
+# 字符串中控制字符的转义表：常见的控制字符使用标准转义，其他控制字符（0x00-0x1F）使用Unicode转义
+_CONTROL_CHAR_ESCAPES = {
+    **{chr(code): f'\\u{code:04x}' for code in range(0x20)},
+    '\n': '\\n',
+    '\r': '\\r',
+    '\t': '\\t',
+    '\b': '\\b',
+    '\f': '\\f',
+}
+
+# 字符串中的控制字符（逐个替换时正则扫描比 str.translate 快得多，后者处理非ASCII文本时逐字符查表）
+_CONTROL_CHAR_RE = re.compile(r'[\x00-\x1f]')
+
+# 字符串中的反斜杠：后面是有效转义字符时为转义序列，否则需要转义反斜杠本身（末尾单独的反斜杠保持不变）
+_BACKSLASH_ESCAPE_RE = re.compile(r'\\(?:([nrtbfu"\\/])|(?=.))', re.DOTALL)
+
+
+def _split_array_objects(text: str, pos: int) -> List[str]:
+    """
+    从数组内容的开头一次扫描切分出各个顶层对象（跳过字符串中的括号）
+    
+    Args:
+        text: 文本
+        pos: 数组内容的起始位置（[ 之后）
+        
+    Returns:
+        各个完整的顶层对象字符串（数组在结束前被截断时只包含已完整的对象）
+    """
+    objects = []
+    depth = 0
+    start = -1
+    for match in _BRACKET_TOKEN_RE.finditer(text, pos):
+        token = match.group()
+        if token == "{" or token == "[":
+            if depth == 0 and token == "{":
+                start = match.start()
+            depth += 1
+        elif token == "}" or token == "]":
+            if depth == 0:
+                # 数组结束
+                break
+            depth -= 1
+            if depth == 0 and start != -1:
+                objects.append(text[start:match.end()])
+                start = -1
+    return objects
+
+
+def _convert_single_quoted_escape(match: re.Match) -> str:
+    """将单引号字符串的内容转换为双引号字符串的内容：\\' 不再需要转义，" 需要转义"""
+    escaped = match.group(1)
+    if escaped is None:
+        return '\\"'
+    if escaped == "'":
+        return "'"
+    return match.group(0)
+
+
+def _fix_backslash_escape(match: re.Match) -> str:
+    """保留有效的转义序列，无效转义序列中的反斜杠本身需要转义"""
+    return match.group(0) if match.group(1) else '\\\\'
+
+
+def _escape_control_char(match: re.Match) -> str:
+    """转义单个控制字符"""
+    return _CONTROL_CHAR_ESCAPES[match.group()]
+
+
+def _escape_string_content(string_content: str) -> str:
+    """
+    转义JSON字符串内容中的控制字符和无效的转义序列
+    
+    Args:
+        string_content: 字符串内容（不包括引号）
+        
+    Returns:
+        转义后的字符串内容
+    """
+    if '\\' in string_content:
+        string_content = _BACKSLASH_ESCAPE_RE.sub(_fix_backslash_escape, string_content)
+    return _CONTROL_CHAR_RE.sub(_escape_control_char, string_content)
+
 
 class Planner:
     """规划器"""
@@ -33,6 +164,12 @@ class Planner:
         self.ollama_client = ollama_client
         self.tool_registry = tool_registry or get_registry()
         self.error_handler = ErrorHandler()
+        # 缓存的工具列表及其渲染文本（注册表修订号变化时刷新）
+        self._tools_revision: Optional[int] = None
+        self._tools_list: List[Dict[str, str]] = []
+        self._tools_text = ""
+        # 响应文本 -> 可直接解析的 JSON 文本的LRU缓存（temperature=0 时重复的提示常得到相同的响应）
+        self._parse_cache: "OrderedDict[str, str]" = OrderedDict()
     
     async def plan(self, goal: str, context: str = "") -> Task:
         """
@@ -47,11 +184,11 @@ class Planner:
         """
         logger.info(f"Planning task: {goal}")
         
-        # 获取可用工具列表
-        available_tools = self.tool_registry.get_tools_list()
+        # 获取可用工具列表（注册表未变化时复用缓存）
+        self._refresh_tools()
         
         # 生成规划Prompt
-        prompt = get_planning_prompt(goal, available_tools, context)
+        prompt = get_planning_prompt(goal, self._tools_list, context, tools_text=self._tools_text)
         
         try:
             # 调用LLM进行规划
@@ -71,10 +208,37 @@ class Planner:
             # 返回一个简单的默认任务
             return self._create_default_task(goal, str(e))
     
+    def _refresh_tools(self) -> None:
+        """工具注册表修订号变化时重新获取工具列表并渲染"""
+        revision = self.tool_registry.revision
+        if revision != self._tools_revision:
+            self._tools_list = self.tool_registry.get_tools_list()
+            self._tools_text = render_tools_text(self._tools_list)
+            self._tools_revision = revision
+    
+    async def plan_many(self, goals: List[str], context: str = "") -> List[Task]:
+        """
+        并发规划多个任务
+        
+        各目标的LLM请求同时发出（Ollama 服务端设置 OLLAMA_NUM_PARALLEL>1 时可并行生成），
+        单个目标规划失败时同样返回默认任务，不影响其他目标
+        
+        Args:
+            goals: 用户目标列表
+            context: 上下文信息（可选，所有目标共用）
+            
+        Returns:
+            任务对象列表，与 goals 顺序一致
+        """
+        return list(await asyncio.gather(*(self.plan(goal, context) for goal in goals)))
+    
     def _clean_json_string(self, json_str: str) -> str:
         """
         清理和修复 JSON 字符串
         
+        一次扫描整个字符串，按词法单元处理：移除注释、单引号字符串转为双引号、
+        转义字符串中的控制字符、补充缺少的逗号、移除尾随逗号（字符串内的内容不受影响）
+        
         Args:
             json_str: 原始 JSON 字符串
             
@@ -85,116 +249,42 @@ class Planner:
         if self._is_valid_json(json_str):
             return json_str
         
-        # 移除行注释（// 开头的注释）
-        json_str = re.sub(r'//.*?$', '', json_str, flags=re.MULTILINE)
-        
-        # 移除块注释（/* ... */）
-        json_str = re.sub(r'/\*.*?\*/', '', json_str, flags=re.DOTALL)
-        
-        # 修复单引号为双引号（但要注意字符串内的单引号）
-        # 使用正则表达式匹配属性名和值
-        def fix_quotes(match):
-            # 匹配属性名: 值 的模式
-            content = match.group(0)
-            # 将单引号替换为双引号（但要避免替换字符串内的单引号）
-            # 简单策略：替换键名和值的引号
-            content = re.sub(r"'(\w+)'(\s*:)", r'"\1"\2', content)  # 键名
-            content = re.sub(r":\s*'([^']*)'", r': "\1"', content)  # 字符串值
-            return content
-        
-        # 尝试修复常见的单引号问题
-        json_str = re.sub(r"'(\w+)'(\s*:)", r'"\1"\2', json_str)  # 键名
-        json_str = re.sub(r":\s*'([^']*)'", r': "\1"', json_str)  # 简单字符串值
-        
-        # 转义字符串值中的控制字符
-        def escape_control_chars(match):
-            """转义JSON字符串值中的控制字符"""
-            # match.group(0) 是整个匹配（包括引号）
-            # match.group(1) 是字符串内容（不包括引号）
-            string_content = match.group(1)
-            
-            # 转义控制字符映射
-            control_char_map = {
-                '\n': '\\n',
-                '\r': '\\r',
-                '\t': '\\t',
-                '\b': '\\b',
-                '\f': '\\f',
-            }
+        parts = []
+        # 上一个有效单元是否是值的结尾（字符串、数字、布尔值、null、} 或 ]）
+        after_value = False
+        # 最后一个逗号在 parts 中的位置（其后只有注释时，遇到 } 或 ] 即为尾随逗号）
+        pending_comma = -1
+        
+        for match in _JSON_TOKEN_RE.finditer(json_str):
+            kind = match.lastgroup
+            token = match.group()
             
-            # 处理字符串内容，转义未转义的控制字符
-            result = []
-            i = 0
-            while i < len(string_content):
-                char = string_content[i]
-                
-                # 如果遇到反斜杠，检查下一个字符
-                if char == '\\' and i + 1 < len(string_content):
-                    next_char = string_content[i + 1]
-                    # 如果已经是转义序列，保留它
-                    if next_char in 'nrtbfu"\\/':
-                        result.append(char + next_char)
-                        i += 2
-                        continue
-                    # 如果反斜杠后面不是有效的转义字符，转义反斜杠本身
-                    result.append('\\\\')
-                    i += 1
-                    continue
-                
-                # 检查是否是控制字符（0x00-0x1F，除了已处理的）
-                if ord(char) < 0x20:
-                    # 如果是常见的控制字符，使用标准转义
-                    if char in control_char_map:
-                        result.append(control_char_map[char])
-                    else:
-                        # 其他控制字符使用Unicode转义
-                        result.append(f'\\u{ord(char):04x}')
-                else:
-                    result.append(char)
-                
-                i += 1
+            if kind == "comment":
+                continue
             
-            # 返回完整的字符串（包括引号）
-            return '"' + ''.join(result) + '"'
-        
-        # 匹配JSON字符串值（在双引号内的内容）
-        # 这个正则表达式匹配：开始引号，然后是内容（可以是转义字符或非引号字符），最后是结束引号
-        json_str = re.sub(r'"((?:[^"\\]|\\.)*)"', escape_control_chars, json_str)
-        
-        # 修复缺少逗号的问题
-        # 使用正则表达式修复常见的缺少逗号情况
-        # 注意：这些正则表达式假设字符串内的引号已经转义为\"
-        
-        # 修复对象属性之间缺少逗号："value" "key": 或 "value" "key"
-        # 匹配：字符串值后跟空白，然后另一个字符串键
-        json_str = re.sub(r'"\s+"([^"]+)"\s*:', r'", "\1":', json_str)
-        # 匹配：字符串值后跟空白，然后另一个字符串值（在数组中）
-        # 注意：在字符类中，]需要转义或放在开头
-        json_str = re.sub(r'"\s+"([^"]+)"\s*([,}\]]])', r'", "\1"\2', json_str)
-        
-        # 修复数组元素之间缺少逗号："value" "value"
-        # 但要注意不要匹配字符串内的内容（字符串内的引号应该是转义的）
-        json_str = re.sub(r'"\s+"', r'", "', json_str)
-        
-        # 修复数字、布尔值、null之间缺少逗号
-        # 数字后跟数字、字符串、布尔值、null、对象、数组
-        # 注意：在字符类中，-需要转义或放在开头/结尾
-        json_str = re.sub(r'(\d+)\s+(["\d{tfn\-])', r'\1, \2', json_str)
-        # true/false/null后跟其他值
-        json_str = re.sub(r'(true|false|null)\s+(["\d{tfn\-])', r'\1, \2', json_str)
-        
-        # 修复}或]后直接跟键或值的情况（但不在字符串内）
-        # 注意：在字符类中，]需要转义或放在开头
-        json_str = re.sub(r'([}\]])\s+"', r'\1, "', json_str)
-        json_str = re.sub(r'([}\]])\s+([\d{tfn\-])', r'\1, \2', json_str)
-        
-        # 移除尾随逗号（在对象和数组的最后一个元素后）
-        json_str = re.sub(r',(\s*[}\]]])', r'\1', json_str)
+            if kind == "close":
+                # 移除尾随逗号
+                if pending_comma != -1:
+                    parts[pending_comma] = ""
+            elif after_value and kind in _VALUE_START_TOKENS:
+                # 修复两个值之间缺少逗号的问题
+                parts.append(",")
+            
+            if kind == "string" or kind == "single":
+                # 单元前的空白长度
+                space_len = match.start(kind) - match.start()
+                content = token[space_len + 1:-1]
+                if kind == "single":
+                    # 单引号字符串转为双引号字符串
+                    content = _SINGLE_QUOTED_ESCAPE_RE.sub(_convert_single_quoted_escape, content)
+                token = token[:space_len] + '"' + _escape_string_content(content) + '"'
+            
+            pending_comma = len(parts) if kind == "other" and token[-1] == "," else -1
+            after_value = kind in _VALUE_END_TOKENS
+            parts.append(token)
         
         # 移除多余的空白字符
-        json_str = json_str.strip()
-        
-        return json_str
+        return "".join(parts).strip()
     
     def _extract_json_from_response(self, response: str) -> str:
         """
@@ -208,73 +298,60 @@ class Planner:
         """
         response = response.strip()
         
-        # 策略1: 查找 markdown 代码块
-        if "```json" in response:
-            start = response.find("```json") + 7
-            end = response.find("```", start)
-            if end != -1:
-                extracted = response[start:end].strip()
-                # 验证提取的 JSON 是否有效
-                if self._is_valid_json(extracted):
-                    return extracted
-        elif "```" in response:
-            start = response.find("```") + 3
-            end = response.find("```", start)
-            if end != -1:
-                extracted = response[start:end].strip()
+        # 策略1: 查找 markdown 代码块（partition 一次扫描同时完成查找和切分）
+        _, fence, body = response.partition("```json")
+        if not fence:
+            _, fence, body = response.partition("```")
+        if fence:
+            extracted, closing, _ = body.partition("```")
+            if closing:
+                extracted = extracted.strip()
                 # 验证提取的 JSON 是否有效
                 if self._is_valid_json(extracted):
                     return extracted
         
         # 策略2: 查找 JSON 对象（以 { 开始，以 } 结束）
-        # 找到第一个 { 和最后一个匹配的 }
-        brace_count = 0
-        start_idx = -1
-        for i, char in enumerate(response):
-            if char == '{':
-                if start_idx == -1:
-                    start_idx = i
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0 and start_idx != -1:
-                    extracted = response[start_idx:i+1].strip()
-                    # 验证提取的 JSON 是否有效
-                    if self._is_valid_json(extracted):
-                        return extracted
-        
-        # 策略3: 如果找不到完整的 JSON，尝试查找包含 "subtasks" 的部分
-        if '"subtasks"' in response or "'subtasks'" in response:
-            # 找到包含 subtasks 的部分
-            start = response.find('"subtasks"')
-            if start == -1:
-                start = response.find("'subtasks'")
-            if start != -1:
-                # 向前查找最近的 {
-                json_start = response.rfind('{', 0, start)
-                if json_start != -1:
-                    # 向后查找匹配的 }
-                    brace_count = 0
-                    for i in range(json_start, len(response)):
-                        if response[i] == '{':
-                            brace_count += 1
-                        elif response[i] == '}':
-                            brace_count -= 1
-                            if brace_count == 0:
-                                extracted = response[json_start:i+1].strip()
-                                # 验证提取的 JSON 是否有效
-                                if self._is_valid_json(extracted):
-                                    return extracted
-        
-        # 策略4: 返回整个响应（让后续清理函数处理）
+        # 一次扫描记录所有配对的 {...} 区间，候选为最外层的各个对象，
+        # 以及包含 "subtasks" 的最内层对象（外层对象无效时它仍可能有效）
+        # 在 UTF-8 字节上扫描和验证：只编码一次，各候选区间直接切片交给 JSON 解析器
+        # （surrogatepass：响应中夹带的孤立代理字符不会导致编码失败）
+        response_bytes = response.encode(errors="surrogatepass")
+        subtasks_pos = response_bytes.find(b'"subtasks"')
+        if subtasks_pos == -1:
+            subtasks_pos = response_bytes.find(b"'subtasks'")
+        
+        candidates = []
+        subtasks_span = None
+        open_positions = []
+        for match in _BRACE_RE.finditer(response_bytes):
+            if match.group() == b"{":
+                open_positions.append(match.start())
+                continue
+            if not open_positions:
+                continue
+            span = (open_positions.pop(), match.end())
+            if not open_positions:
+                candidates.append(span)
+            # 配对区间按结束位置依次出现，第一个包含 subtasks 的即为最内层
+            if subtasks_span is None and span[0] < subtasks_pos < span[1]:
+                subtasks_span = span
+        if subtasks_span is not None and subtasks_span not in candidates:
+            candidates.append(subtasks_span)
+        
+        # 从最长的候选开始验证（候选的总长度不超过响应长度的两倍）
+        for start, end in sorted(candidates, key=lambda span: span[1] - span[0], reverse=True):
+            if self._is_valid_json(response_bytes[start:end]):
+                return response_bytes[start:end].decode(errors="surrogatepass")
+        
+        # 策略3: 返回整个响应（让后续清理函数处理）
         return response
     
-    def _is_valid_json(self, json_str: str) -> bool:
+    def _is_valid_json(self, json_str: Union[str, bytes]) -> bool:
         """
         验证字符串是否是有效的 JSON
         
         Args:
-            json_str: 待验证的字符串
+            json_str: 待验证的字符串（或其 UTF-8 字节）
             
         Returns:
             如果是有效的 JSON 返回 True，否则返回 False
@@ -283,7 +360,7 @@ class Planner:
             return False
         
         try:
-            data = json.loads(json_str)
+            data = _fast_json_loads(json_str)
             # 如果是字典且包含 subtasks，认为是有效的规划 JSON
             if isinstance(data, dict) and "subtasks" in data:
                 return True
@@ -354,54 +431,6 @@ class Planner:
         plan_data["subtasks"] = validated_subtasks
         return plan_data
     
-    def _fix_common_json_issues(self, json_str: str) -> str:
-        """
-        修复常见的JSON问题
-        
-        Args:
-            json_str: JSON字符串
-            
-        Returns:
-            修复后的JSON字符串
-        """
-        # 修复未闭合的字符串
-        # 查找未闭合的双引号
-        lines = json_str.split('\n')
-        fixed_lines = []
-        in_string = False
-        escape_next = False
-        
-        for line in lines:
-            fixed_line = []
-            for char in line:
-                if escape_next:
-                    fixed_line.append(char)
-                    escape_next = False
-                    continue
-                
-                if char == '\\':
-                    escape_next = True
-                    fixed_line.append(char)
-                    continue
-                
-                if char == '"':
-                    in_string = not in_string
-                    fixed_line.append(char)
-                else:
-                    fixed_line.append(char)
-            
-            fixed_lines.append(''.join(fixed_line))
-        
-        json_str = '\n'.join(fixed_lines)
-        
-        # 修复未转义的控制字符（在字符串值中）
-        # 这个已经在_clean_json_string中处理了，但这里可以添加额外的修复
-        
-        # 修复数字后的逗号问题
-        json_str = re.sub(r'(\d+)\s*,(\s*[}\]])', r'\1\2', json_str)
-        
-        return json_str
-    
     def _extract_partial_json(self, response: str) -> Optional[Dict[str, Any]]:
         """
         尝试从响应中提取部分可用的JSON数据
@@ -414,14 +443,11 @@ class Planner:
         """
         try:
             # 尝试找到subtasks数组
-            subtasks_pattern = r'"subtasks"\s*:\s*\[(.*?)\]'
-            match = re.search(subtasks_pattern, response, re.DOTALL)
+            match = _SUBTASKS_ARRAY_START_RE.search(response)
             
             if match:
-                subtasks_content = match.group(1)
-                # 尝试提取每个subtask
-                subtask_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-                subtask_matches = re.findall(subtask_pattern, subtasks_content)
+                # 尝试提取每个subtask（数组被截断时，保留已完整的subtask）
+                subtask_matches = _split_array_objects(response, match.end())
                 
                 if subtask_matches:
                     subtasks = []
@@ -457,7 +483,9 @@ class Planner:
         error_context = broken_json[error_context_start:error_context_end]
         error_marker = " " * (error.pos - error_context_start) + "^"
         
-        fix_prompt = f"""以下是一个格式错误的 JSON 字符串，请修复它使其成为有效的 JSON。
+        # 指令和错误位置附近的上下文放在系统消息中，完整的损坏 JSON 原样作为用户消息，
+        # 不再拼接进一个大的提示字符串；JSON 模式约束模型只输出有效的 JSON
+        system_prompt = f"""用户消息是一个格式错误的 JSON 字符串，请修复它使其成为有效的 JSON。
 
 错误信息：{error.msg}
 错误位置：第 {error.lineno} 行，第 {error.colno} 列（字符位置 {error.pos}）
@@ -466,31 +494,22 @@ class Planner:
 {error_context}
 {error_marker}
 
-完整的损坏 JSON：
-{broken_json}
-
 **重要要求：**
-1. 仔细检查错误位置（第 {error.lineno} 行，第 {error.colno} 列）附近的代码
+1. 仔细检查错误位置附近的代码
 2. 修复所有格式错误（缺少逗号、尾随逗号、缺少引号、单引号、未转义的控制字符等）
-3. 确保修复后的 JSON 可以被 Python 的 json.loads() 正确解析
-4. **只返回修复后的 JSON，不要任何解释、说明、markdown 代码块标记或其他文字**
-5. 保持原有的数据结构不变，不要修改数据内容
-6. 确保所有字符串使用双引号，所有属性名使用双引号
-7. 确保所有逗号、括号、大括号都正确匹配
-8. 每个对象属性之间必须有逗号分隔（最后一个属性除外）
-9. 每个数组元素之间必须有逗号分隔（最后一个元素除外）
-
-**输出格式：**
-直接输出修复后的 JSON，不要包含 ```json 或 ``` 标记，不要有任何前缀或后缀文字。
-
-修复后的 JSON："""
+3. 保持原有的数据结构不变，不要修改数据内容
+4. 只输出修复后的 JSON，不要任何解释、markdown 代码块标记或其他文字"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": broken_json}
+        ]
         
         try:
             logger.info("Attempting LLM-based JSON repair...")
-            fixed_response = await self.ollama_client.generate_async(fix_prompt)
+            fixed_response = await self.ollama_client.chat_async(messages, format="json")
             
             # 记录 LLM 的原始响应
-            logger.debug(f"LLM fix response (length: {len(fixed_response)} chars):\n{fixed_response}")
+            logger.debug("LLM fix response (length: %d chars):\n%s", len(fixed_response), fixed_response)
             
             # 策略 1: 先尝试直接解析 LLM 返回的响应（如果已经是正确的 JSON）
             try:
@@ -546,6 +565,21 @@ class Planner:
             logger.debug(f"Fix error details: {e}", exc_info=True)
             return None
     
+    def _cache_json_text(self, response: str, json_str: str):
+        """
+        缓存响应中提取并清理后的 JSON 文本（只缓存完整解析成功的结果，部分解析、LLM修复和默认结构不缓存）
+        
+        命中时重新解析该文本，每次都得到新的对象，调用方修改结果不会影响缓存
+        
+        Args:
+            response: LLM响应文本
+            json_str: 可直接解析的 JSON 文本
+        """
+        self._parse_cache[response] = json_str
+        self._parse_cache.move_to_end(response)
+        if len(self._parse_cache) > _PARSE_CACHE_SIZE:
+            self._parse_cache.popitem(last=False)
+    
     async def _parse_plan_response(self, response: str) -> Dict[str, Any]:
         """
         解析规划响应（JSON）
@@ -558,25 +592,52 @@ class Planner:
         """
         original_response = response
         
-        # 记录原始响应（DEBUG级别，用于调试）
-        logger.debug(f"Original LLM response (length: {len(response)} chars):\n{response}")
+        # 相同响应之前已成功解析过时，跳过提取和清理，直接解析缓存的 JSON 文本
+        cached = self._parse_cache.get(response)
+        if cached is not None:
+            self._parse_cache.move_to_end(response)
+            logger.debug("Reusing cached plan JSON text")
+            try:
+                plan_data = _fast_json_loads(cached)
+            except ValueError:
+                plan_data = json.loads(cached)
+            return self._validate_plan_data(plan_data)
+        
+        # 记录原始响应（DEBUG级别，用于调试；延迟格式化，未开启DEBUG时不复制整个响应）
+        logger.debug("Original LLM response (length: %d chars):\n%s", len(response), response)
         
         try:
+            # 响应本身就是 JSON 对象时（多数情况）直接解析，跳过提取和清理
+            stripped = response.strip()
+            if stripped.startswith("{"):
+                try:
+                    plan_data = _fast_json_loads(stripped)
+                except ValueError:
+                    plan_data = None
+                if isinstance(plan_data, dict):
+                    logger.debug("Parsed plan response directly")
+                    plan_data = self._validate_plan_data(plan_data)
+                    self._cache_json_text(original_response, stripped)
+                    return plan_data
+            
             # 步骤1: 提取 JSON 字符串
             json_str = self._extract_json_from_response(response)
-            logger.debug(f"Extracted JSON string (length: {len(json_str)} chars):\n{json_str[:500]}...")
-            
-            # 步骤2: 清理 JSON 字符串
-            json_str = self._clean_json_string(json_str)
-            logger.debug(f"Cleaned JSON string (length: {len(json_str)} chars):\n{json_str[:500]}...")
+            logger.debug("Extracted JSON string (length: %d chars):\n%.500s...", len(json_str), json_str)
             
-            # 步骤3: 尝试解析
-            plan_data = json.loads(json_str)
+            try:
+                # 步骤2: 提取结果通常已是有效的 JSON，直接解析，无需清理
+                plan_data = _fast_json_loads(json_str)
+            except ValueError:
+                # 步骤3: 清理 JSON 字符串后再解析
+                json_str = self._clean_json_string(json_str)
+                logger.debug("Cleaned JSON string (length: %d chars):\n%.500s...", len(json_str), json_str)
+                plan_data = json.loads(json_str)
             
             # 步骤4: 验证数据结构完整性
             plan_data = self._validate_plan_data(plan_data)
             
             logger.debug("Successfully parsed plan response")
+            self._cache_json_text(original_response, json_str)
             return plan_data
         
         except json.JSONDecodeError as e:
@@ -598,25 +659,7 @@ class Planner:
             
             first_error = e
             
-            # 策略 1: 尝试增强的正则修复
-            try:
-                logger.debug("Attempting enhanced regex-based JSON repair...")
-                json_str = self._extract_json_from_response(original_response)
-                
-                # 使用增强的清理方法
-                json_str = self._clean_json_string(json_str)
-                json_str = self._fix_common_json_issues(json_str)
-                
-                plan_data = json.loads(json_str)
-                plan_data = self._validate_plan_data(plan_data)
-                
-                if "subtasks" in plan_data:
-                    logger.info("Successfully repaired and parsed JSON after enhanced regex repair")
-                    return plan_data
-            except Exception as repair_error:
-                logger.debug(f"Enhanced regex repair failed: {repair_error}")
-            
-            # 策略 2: 尝试部分解析（提取可用的subtasks）
+            # 策略 1: 尝试部分解析（提取可用的subtasks）
             try:
                 logger.debug("Attempting partial JSON extraction...")
                 partial_data = self._extract_partial_json(original_response)
@@ -626,7 +669,7 @@ class Planner:
             except Exception as partial_error:
                 logger.debug(f"Partial extraction failed: {partial_error}")
             
-            # 策略 3: 使用 LLM 修复（参考 LangChain 的 OutputFixingParser）
+            # 策略 2: 使用 LLM 修复（参考 LangChain 的 OutputFixingParser）
             try:
                 fixed_data = await self._fix_json_with_llm(original_response, first_error)
                 if fixed_data:
@@ -707,7 +750,11 @@ class Planner:
         subtasks = []
         
         for subtask_data in plan_data.get("subtasks", []):
-            subtask_id = subtask_data.get("id", f"subtask_{uuid.uuid4().hex[:8]}")
+            # 缺少id时才生成随机id（避免每个子任务都调用 uuid4）
+            if "id" in subtask_data:
+                subtask_id = subtask_data["id"]
+            else:
+                subtask_id = f"subtask_{uuid.uuid4().hex[:8]}"
             description = subtask_data.get("description", "")
             actions_data = subtask_data.get("actions", [])
             dependencies = subtask_data.get("dependencies", [])
@@ -717,9 +764,9 @@ class Planner:
             for action_data in actions_data:
                 action_type_str = action_data.get("type", "gui")
                 try:
-                    action_type = ActionType(action_type_str)
-                except ValueError:
-                    action_type = ActionType.GUI  # 默认使用GUI
+                    action_type = _ACTION_TYPES.get(action_type_str, ActionType.GUI)  # 默认使用GUI
+                except TypeError:
+                    action_type = ActionType.GUI  # 类型值不可哈希（如列表）
                 
                 action = Action(
                     type=action_type,
@@ -108,6 +108,7 @@ class AgentConfig:
     
     # 数据库配置
     database_path: str = "./data/memory.db"
+    collect_tool_stats: bool = False  # 是否另外逐条记录工具使用统计（tool_usage表，供 get_tool_stats 使用）
     
     # MCP配置
     mcp_enabled: bool = False  # 是否启用MCP
@@ -136,9 +137,9 @@ class MemoryEntry:
     created_at: datetime = field(default_factory=datetime.now)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ToolUsage:
-    """工具使用记录"""
+    """工具使用记录（不可变，可直接由 orjson 序列化）"""
     tool_name: str
     success: bool
     execution_time: float
@@ -243,13 +243,14 @@ class Worker:
             执行结果列表
         """
         results = []
+        # 已成功执行的动作ID，随执行结果增量维护
+        succeeded_ids = set()
         
         for action in actions:
             # 检查依赖
             if action.dependencies:
                 # 确保依赖的动作已成功执行
-                dependency_ids = [r.action_id for r in results if r.success]
-                if not all(dep in dependency_ids for dep in action.dependencies):
+                if not succeeded_ids.issuperset(action.dependencies):
                     logger.warning(f"Action {action.tool} has unmet dependencies")
                     results.append(ActionResult(
                         action_id=f"{action.type}_{action.tool}",
@@ -261,6 +262,8 @@ class Worker:
             
             result = await self.execute_action(action, context)
             results.append(result)
+            if result.success:
+                succeeded_ids.add(result.action_id)
             
             # 如果动作失败且是关键动作，可以中断执行
             if not result.success:
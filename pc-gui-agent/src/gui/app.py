@@ -26,6 +26,9 @@ class PCGUIAgentApp:
         self.page.window.height = 800
         self.page.window.min_width = 800
         self.page.window.min_height = 600
+        # 关闭窗口时先清理资源（关闭数据库连接等）再销毁窗口
+        self.page.window.prevent_close = True
+        self.page.window.on_event = self._on_window_event
         
         # 初始化Agent
         self.agent: Optional[PCGUIAgent] = None
@@ -279,6 +282,12 @@ class PCGUIAgentApp:
         """日志回调"""
         self.log_viewer.add_log(level, message, source)
     
+    async def _on_window_event(self, e):
+        """窗口事件回调"""
+        if e.data == "close":
+            await self.close()
+            self.page.window.destroy()
+    
     async def close(self):
         """关闭应用，清理资源"""
         if self.agent:
@@ -1,10 +1,32 @@
 """
 Prompt模板
 """
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 
 
-def get_planning_prompt(goal: str, available_tools: List[Dict[str, str]], context: str = "") -> str:
+def render_tools_text(available_tools: List[Dict[str, str]]) -> str:
+    """
+    渲染Prompt中的工具列表
+    
+    Args:
+        available_tools: 可用工具列表，格式：[{"name": "...", "description": "..."}]
+        
+    Returns:
+        工具列表文本（每行一个工具）
+    """
+    return "\n".join([
+        f"- {tool['name']}: {tool['description']}"
+        for tool in available_tools
+    ])
+
+
+def get_planning_prompt(
+    goal: str,
+    available_tools: List[Dict[str, str]],
+    context: str = "",
+    tools_text: Optional[str] = None
+) -> str:
     """
     获取任务规划Prompt
     
@@ -12,14 +34,13 @@ def get_planning_prompt(goal: str, available_tools: List[Dict[str, str]], contex
         goal: 用户目标
         available_tools: 可用工具列表，格式：[{"name": "...", "description": "..."}]
         context: 上下文信息（可选）
+        tools_text: 已渲染的工具列表文本（可选，由 render_tools_text 生成，提供时不再重新渲染）
         
     Returns:
         Prompt字符串
     """
-    tools_text = "\n".join([
-        f"- {tool['name']}: {tool['description']}"
-        for tool in available_tools
-    ])
+    if tools_text is None:
+        tools_text = render_tools_text(available_tools)
     
     prompt = f"""你是一个智能任务规划助手。请根据用户目标，生成详细的执行计划。
 
@@ -275,54 +296,36 @@ def get_error_analysis_prompt(
     return prompt
 
 
-def get_agent_step_prompt(
-    goal: str,
-    context: Any,
-    available_tools: List[Dict[str, str]],
-    action_results: List[Any],
-    last_decision: Any = None
-) -> str:
+@lru_cache(maxsize=32)
+def _agent_step_header(goal: str, tools: Tuple[Tuple[str, str], ...]) -> str:
     """
-    获取Agent模式的逐步决策Prompt
+    生成逐步决策Prompt中不随执行步骤变化的头部（目标和工具列表）
+    
+    同一任务的各个步骤目标和工具列表相同，头部只渲染一次
     
     Args:
         goal: 用户目标
-        context: 执行上下文
-        available_tools: 可用工具列表
-        action_results: 已执行的动作结果列表
-        last_decision: 上一步决策（可选）
+        tools: (工具名称, 工具描述) 元组
         
     Returns:
-        Prompt字符串
+        Prompt头部字符串
     """
     tools_text = "\n".join([
-        f"- {tool['name']}: {tool['description']}"
-        for tool in available_tools
+        f"- {name}: {description}"
+        for name, description in tools
     ])
     
-    # 格式化已执行的动作结果
-    results_text = ""
-    if action_results:
-        results_text = "\n已执行的动作：\n"
-        for idx, result in enumerate(action_results[-5:], 1):  # 只显示最近5个结果
-            results_text += f"{idx}. {result.action_id if hasattr(result, 'action_id') else 'unknown'}: "
-            results_text += f"{'成功' if result.success else '失败'} - {result.message}\n"
-    
-    # 格式化上下文变量
-    variables_text = ""
-    if hasattr(context, 'variables') and context.variables:
-        variables_text = "\n上下文变量：\n"
-        for key, value in list(context.variables.items())[-10:]:  # 只显示最近10个变量
-            variables_text += f"- {key}: {str(value)[:100]}\n"
-    
-    prompt = f"""你是一个智能任务执行助手，需要逐步决策每一步操作来完成用户目标。
+    return f"""你是一个智能任务执行助手，需要逐步决策每一步操作来完成用户目标。
 
 用户目标：{goal}
 
 可用工具：
 {tools_text}
-{results_text}
-{variables_text}
+"""
+
+
+# 逐步决策Prompt的固定尾部（决策规则和JSON格式要求）
+_AGENT_STEP_FOOTER = """
 
 **重要：工具名称使用规则**
 1. 必须使用工具列表中每个工具的"name"字段的精确值（区分大小写）
@@ -330,20 +333,20 @@ def get_agent_step_prompt(
 3. 例如：如果工具列表中有"navigate"，必须使用"navigate"，不能使用"浏览器"、"导航"等
 
 请分析当前状态，决定下一步操作。返回JSON格式：
-{{
-  "action": {{
+{
+  "action": {
     "type": "gui|code|mcp",
     "tool": "工具名称（必须使用工具列表中的精确name字段）",
-    "args": {{"参数名": "参数值"}},
+    "args": {"参数名": "参数值"},
     "description": "动作描述"
-  }},
+  },
   "should_continue": true/false,
   "should_retry": false,
   "should_skip": false,
   "reasoning": "决策理由",
   "confidence": 0.0-1.0,
   "next_step_description": "下一步描述"
-}}
+}
 
 **决策规则：**
 1. 如果任务已完成，设置 should_continue 为 false
@@ -361,8 +364,49 @@ def get_agent_step_prompt(
 5. 只返回纯JSON，不要包含markdown代码块标记或其他文本
 
 请生成下一步决策："""
+
+
+def get_agent_step_prompt(
+    goal: str,
+    context: Any,
+    available_tools: List[Dict[str, str]],
+    action_results: List[Any],
+    last_decision: Any = None
+) -> str:
+    """
+    获取Agent模式的逐步决策Prompt
     
-    return prompt
+    Args:
+        goal: 用户目标
+        context: 执行上下文
+        available_tools: 可用工具列表
+        action_results: 已执行的动作结果列表
+        last_decision: 上一步决策（可选）
+        
+    Returns:
+        Prompt字符串
+    """
+    header = _agent_step_header(
+        goal,
+        tuple((tool['name'], tool['description']) for tool in available_tools)
+    )
+    
+    # 格式化已执行的动作结果
+    results_text = ""
+    if action_results:
+        results_text = "\n已执行的动作：\n"
+        for idx, result in enumerate(action_results[-5:], 1):  # 只显示最近5个结果
+            results_text += f"{idx}. {result.action_id if hasattr(result, 'action_id') else 'unknown'}: "
+            results_text += f"{'成功' if result.success else '失败'} - {result.message}\n"
+    
+    # 格式化上下文变量
+    variables_text = ""
+    if hasattr(context, 'variables') and context.variables:
+        variables_text = "\n上下文变量：\n"
+        for key, value in list(context.variables.items())[-10:]:  # 只显示最近10个变量
+            variables_text += f"- {key}: {str(value)[:100]}\n"
+    
+    return f"{header}{results_text}\n{variables_text}{_AGENT_STEP_FOOTER}"
 
 
 def get_workflow_validation_prompt(
@@ -58,6 +58,7 @@ class PCGUIAgent:
                 retry_delay=float(os.getenv("RETRY_DELAY", "1.0")),
                 action_timeout=int(os.getenv("ACTION_TIMEOUT", "30")),
                 database_path=os.getenv("DATABASE_PATH", "./data/memory.db"),
+                collect_tool_stats=os.getenv("COLLECT_TOOL_STATS", "false").lower() == "true",
                 mcp_enabled=os.getenv("MCP_ENABLED", "false").lower() == "true",
                 mcp_server_command=os.getenv("MCP_SERVER_COMMAND"),
                 mcp_transport=os.getenv("MCP_TRANSPORT", "stdio"),
@@ -174,6 +175,9 @@ class PCGUIAgent:
         from .tools.gui_tools import GUITools
         gui_tools_instance = GUITools()
         await gui_tools_instance.close()
+        
+        # 关闭记忆模块的数据库连接
+        await self.memory.close()
         logger.info("Agent closed")
 
 
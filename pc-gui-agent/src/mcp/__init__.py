@@ -3,6 +3,7 @@ MCP模块
 提供Model Context Protocol客户端和服务器实现
 """
 from .client import MCPClient
+from .client_pool import MCPClientPool, get_client_pool
 
-__all__ = ["MCPClient"]
+__all__ = ["MCPClient", "MCPClientPool", "get_client_pool"]
 
@@ -4,7 +4,7 @@ MCP客户端
 参考：https://mcp-docs.cn/quickstart/client
 """
 import shlex
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence
 from contextlib import AsyncExitStack
 
 # 尝试从本地 python-sdk 导入，如果失败则从已安装的包导入
@@ -45,7 +45,8 @@ class MCPClient:
     def __init__(
         self,
         server_command: Optional[str] = None,
-        transport: str = "stdio"  # stdio 或 http
+        transport: str = "stdio",  # stdio 或 http
+        server_argv: Optional[Sequence[str]] = None
     ):
         """
         初始化MCP客户端
@@ -53,7 +54,12 @@ class MCPClient:
         Args:
             server_command: MCP服务器命令（如 "python -m mcp.server.filesystem"）
             transport: 传输方式（stdio 或 http，目前仅支持 stdio）
+            server_argv: MCP服务器命令参数列表（如 ["python", "-m", "mcp.server.filesystem"]），
+                提供时直接使用，不再解析 server_command
         """
+        self.server_argv = list(server_argv) if server_argv else None
+        if server_command is None and self.server_argv:
+            server_command = shlex.join(self.server_argv)
         self.server_command = server_command
         self.transport = transport
         self._stdio_params: Optional[StdioServerParameters] = None
@@ -82,8 +88,20 @@ class MCPClient:
             logger.error("Empty server command after parsing")
             raise ValueError("Empty server command")
         
+        return self._build_stdio_params(parts)
+    
+    def _build_stdio_params(self, parts: Sequence[str]) -> StdioServerParameters:
+        """
+        根据命令参数列表创建 StdioServerParameters
+        
+        Args:
+            parts: 命令参数列表，第一个元素为可执行程序
+            
+        Returns:
+            StdioServerParameters 对象
+        """
         command = parts[0]
-        args = parts[1:] if len(parts) > 1 else []
+        args = list(parts[1:])
         
         logger.debug(f"Parsed command: command={command}, args={args}")
         
@@ -102,6 +120,10 @@ class MCPClient:
         Returns:
             是否连接成功
         """
+        if self.connected:
+            logger.debug("MCP client already connected, reusing existing session")
+            return True
+        
         if not self.server_command:
             logger.warning("MCP server command not specified, skipping connection")
             return False
@@ -113,9 +135,12 @@ class MCPClient:
         try:
             logger.debug("Starting MCP connection process...")
             
-            # 解析服务器命令
+            # 解析服务器命令（已提供参数列表时直接使用）
             logger.debug("Step 1: Parsing server command")
-            self._stdio_params = self._parse_server_command(self.server_command)
+            if self.server_argv:
+                self._stdio_params = self._build_stdio_params(self.server_argv)
+            else:
+                self._stdio_params = self._parse_server_command(self.server_command)
             logger.debug(f"Server parameters: command={self._stdio_params.command}, args={self._stdio_params.args}")
             
             # 使用 AsyncExitStack 管理资源（参考 MCP 官方文档最佳实践）
@@ -0,0 +1,198 @@
+"""
+MCP客户端连接池
+按服务器命令缓存已连接的MCP客户端，避免每次使用都重新启动服务器进程并握手
+"""
+import asyncio
+import shlex
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar, Union
+
+from .client import MCPClient
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# 服务器命令：命令字符串，或已解析好的命令参数列表
+ServerCommand = Union[str, Sequence[str]]
+
+
+def _command_key(command: ServerCommand) -> str:
+    """连接池的键：命令参数列表拼接为命令字符串"""
+    return command if isinstance(command, str) else shlex.join(command)
+
+
+class _PoolEntry:
+    """连接池条目"""
+    
+    __slots__ = ("client", "in_use", "last_used", "owner")
+    
+    def __init__(self, client: MCPClient):
+        self.client = client
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        # 建立连接的任务（MCP SDK 要求在同一个任务中断开连接）
+        self.owner = asyncio.current_task()
+
+
+class MCPClientPool:
+    """
+    MCP客户端连接池
+    
+    以服务器命令为键的LRU缓存：最近使用的客户端排在末尾，超过容量时
+    从头部淘汰最久未使用且空闲的客户端；空闲超过 idle_timeout 的客户端
+    在下次取用时淘汰。每次 checkout() 都应与 checkin() 配对（或使用 transaction()），
+    只有已归还的客户端才会被淘汰
+    
+    注意：MCP SDK 要求在建立连接的同一个任务中断开连接。淘汰发生在其他任务中时，
+    客户端先移出连接池，由 close_all() 断开，应在创建连接的任务中调用 close_all()
+    """
+    
+    def __init__(self, maxsize: int = 4, idle_timeout: float = 300.0, transport: str = "stdio"):
+        """
+        初始化连接池
+        
+        Args:
+            maxsize: 最多保留的客户端数量
+            idle_timeout: 空闲客户端的最长保留时间（秒）
+            transport: 新建客户端使用的传输方式
+        """
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self.transport = transport
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        # 已淘汰、但只能由建立连接的任务断开的客户端
+        self._retired: List[MCPClient] = []
+        self._lock = asyncio.Lock()
+    
+    async def checkout(self, command: ServerCommand) -> MCPClient:
+        """
+        取出指定服务器命令对应的已连接客户端，不存在或已断开时新建连接
+        
+        Args:
+            command: MCP服务器命令（字符串或命令参数列表，参数列表直接用于启动服务器，不再拆分）
+        
+        Returns:
+            已连接的MCP客户端（用完后调用 checkin() 归还）
+        
+        Raises:
+            ConnectionError: 连接MCP服务器失败
+        """
+        key = _command_key(command)
+        async with self._lock:
+            await self._close_idle()
+            
+            entry = self._entries.get(key)
+            if entry is not None and not entry.client.connected:
+                # 健康检查：连接已断开的客户端直接丢弃
+                logger.debug(f"Dropping disconnected MCP client: {key}")
+                del self._entries[key]
+                entry = None
+            
+            if entry is not None:
+                return self._acquire(key, entry)
+        
+        # 在锁外建立连接（启动服务器进程可能耗时数秒，不阻塞其他命令的取用和归还）
+        if isinstance(command, str):
+            client = MCPClient(server_command=command, transport=self.transport)
+        else:
+            client = MCPClient(server_argv=command, transport=self.transport)
+        if not await client.connect():
+            raise ConnectionError(f"Failed to connect to MCP server: {key}")
+        
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.client.connected:
+                # 其他任务已为同一命令建立连接：使用已有连接，断开刚建立的连接
+                await client.disconnect()
+            else:
+                entry = _PoolEntry(client)
+                self._entries[key] = entry
+            client = self._acquire(key, entry)
+            await self._evict()
+            return client
+    
+    async def checkin(self, command: ServerCommand) -> None:
+        """
+        归还客户端（连接保持打开，供后续取用）
+        
+        Args:
+            command: MCP服务器命令（与 checkout 时相同）
+        """
+        async with self._lock:
+            entry = self._entries.get(_command_key(command))
+            if entry is not None and entry.in_use > 0:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+            await self._evict()
+    
+    async def transaction(self, command: ServerCommand, fn: Callable[[MCPClient], Awaitable[T]]) -> T:
+        """
+        取出客户端执行操作，结束后自动归还
+        
+        Args:
+            command: MCP服务器命令
+            fn: 接收客户端的异步函数
+        
+        Returns:
+            fn 的返回值
+        """
+        client = await self.checkout(command)
+        try:
+            return await fn(client)
+        finally:
+            await self.checkin(command)
+    
+    async def close_all(self) -> None:
+        """断开并清空所有客户端（包括已淘汰但尚未断开的客户端）"""
+        async with self._lock:
+            clients = [entry.client for entry in self._entries.values()] + self._retired
+            self._entries.clear()
+            self._retired = []
+        for client in clients:
+            await client.disconnect()
+    
+    def _acquire(self, key: str, entry: _PoolEntry) -> MCPClient:
+        """标记条目为使用中并移到最近使用的一端（需持有锁）"""
+        self._entries.move_to_end(key)
+        entry.in_use += 1
+        entry.last_used = time.monotonic()
+        return entry.client
+    
+    async def _retire(self, key: str, reason: str) -> None:
+        """从连接池移除客户端，当前任务建立了该连接时立即断开（需持有锁）"""
+        entry = self._entries.pop(key)
+        logger.debug(f"{reason} MCP client: {key}")
+        if entry.owner is asyncio.current_task():
+            await entry.client.disconnect()
+        else:
+            self._retired.append(entry.client)
+    
+    async def _evict(self) -> None:
+        """超过容量时从最久未使用的一端淘汰空闲客户端（需持有锁）"""
+        for key in list(self._entries.keys()):
+            if len(self._entries) <= self.maxsize:
+                break
+            if not self._entries[key].in_use:
+                await self._retire(key, "Evicting")
+    
+    async def _close_idle(self) -> None:
+        """淘汰空闲超时的客户端（需持有锁）"""
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if not entry.in_use and now - entry.last_used > self.idle_timeout:
+                await self._retire(key, "Closing idle")
+
+
+# 全局连接池实例
+_pool: Optional[MCPClientPool] = None
+
+
+def get_client_pool() -> MCPClientPool:
+    """获取全局MCP客户端连接池"""
+    global _pool
+    if _pool is None:
+        _pool = MCPClientPool()
+    return _pool
@@ -168,18 +168,22 @@ class MCPTool(BaseTool):
             }
 
 
-def create_mcp_tools(mcp_client: MCPClient) -> List[MCPTool]:
+def create_mcp_tools(
+    mcp_client: MCPClient,
+    tools: Optional[List[Dict[str, Any]]] = None
+) -> List[MCPTool]:
     """
     从MCP客户端创建工具包装器列表
     
     Args:
         mcp_client: MCP客户端实例
+        tools: 已获取的工具列表（可选），未传入时使用客户端已发现的工具
         
     Returns:
         MCP工具包装器列表
     """
+    mcp_tools = tools if tools is not None else mcp_client.get_tools()
     tools = []
-    mcp_tools = mcp_client.get_tools()
     
     for tool_schema in mcp_tools:
         tool_name = tool_schema.get("name")
@@ -13,6 +13,13 @@ class ToolRegistry:
     
     def __init__(self):
         self._tools: Dict[str, BaseTool] = {}
+        # 修订号：每次注册工具时递增，调用方据此判断缓存的工具列表是否过期
+        self._revision = 0
+    
+    @property
+    def revision(self) -> int:
+        """注册表修订号"""
+        return self._revision
     
     def register(self, tool: BaseTool) -> None:
         """
@@ -24,6 +31,7 @@ class ToolRegistry:
         if tool.name in self._tools:
             logger.warning(f"Tool '{tool.name}' already registered, overwriting...")
         self._tools[tool.name] = tool
+        self._revision += 1
         logger.info(f"Registered tool: {tool.name}")
     
     def register_multiple(self, tools: List[BaseTool]) -> None:
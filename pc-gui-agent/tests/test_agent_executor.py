@@ -0,0 +1,48 @@
+"""
+Agent执行器决策解析测试
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.agent_executor import AgentExecutor
+
+
+@pytest.fixture
+def executor():
+    """执行器fixture（决策解析不依赖其他组件）"""
+    return AgentExecutor(worker=None, planner=None, reflector=None, ollama_client=None)
+
+
+def test_parse_decision_from_fenced_block(executor):
+    """测试从 markdown 代码块中解析决策，代码块之后的文本被忽略"""
+    response = """```json
+{"action": {"type": "gui", "tool": "click", "args": {"selector": "#ok"}, "description": "点击"},
+ "should_continue": true, "reasoning": "继续", "confidence": 0.8}
+```
+以上是决策。"""
+    decision = executor._parse_decision_response(response, [])
+    assert decision.action.tool == "click"
+    assert decision.action.args == {"selector": "#ok"}
+    assert decision.should_continue is True
+    assert decision.confidence == 0.8
+
+
+def test_parse_decision_does_not_use_nested_action_as_decision(executor):
+    """测试外层对象无效时不会把内层的 action 对象当作决策"""
+    response = '决策：{"should_continue": true "action": {"type": "gui", "tool": "click", "args": {}}}'
+    decision = executor._parse_decision_response(response, [])
+    assert decision.action is None
+    assert decision.should_continue is False
+    assert decision.reasoning.startswith("解析决策响应失败")
+
+
+def test_parse_decision_without_json(executor):
+    """测试响应中没有 JSON 对象时返回停止执行的默认决策"""
+    decision = executor._parse_decision_response("任务已完成", [])
+    assert decision.action is None
+    assert decision.should_continue is False
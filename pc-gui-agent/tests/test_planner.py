@@ -0,0 +1,184 @@
+"""
+规划器 JSON 解析与修复测试
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.planner import Planner
+from src.tools.registry import ToolRegistry
+
+
+class FakeOllamaClient:
+    """不可用的LLM：修复请求一律返回无效内容，确保测试只覆盖本地修复逻辑"""
+    
+    async def generate_async(self, prompt, **kwargs):
+        return "not json"
+    
+    async def chat_async(self, messages, **kwargs):
+        return "not json"
+
+
+PLAN = {
+    "subtasks": [
+        {
+            "id": "subtask_1",
+            "description": "打开网页",
+            "actions": [
+                {"type": "gui", "tool": "navigate", "args": {"url": "https://example.com/a//b"}, "description": "打开"}
+            ],
+            "dependencies": []
+        },
+        {
+            "id": "subtask_2",
+            "description": "点击按钮",
+            "actions": [
+                {"type": "gui", "tool": "click", "args": {"selector": "#ok"}, "description": "点击"}
+            ],
+            "dependencies": ["subtask_1"]
+        }
+    ]
+}
+
+
+@pytest.fixture
+def planner():
+    """规划器fixture"""
+    return Planner(ollama_client=FakeOllamaClient(), tool_registry=ToolRegistry())
+
+
+def clean_and_load(planner, text):
+    """清理后解析"""
+    return json.loads(planner._clean_json_string(text))
+
+
+def test_clean_removes_comments(planner):
+    """测试删除行注释和块注释"""
+    text = """{
+        // 子任务列表
+        "subtasks": [ /* 空 */ ]
+    }"""
+    assert clean_and_load(planner, text) == {"subtasks": []}
+
+
+def test_clean_keeps_urls_and_comment_markers_in_strings(planner):
+    """测试字符串中的 // 和 /* 不被当作注释"""
+    text = '{"url": "https://example.com/a//b", "pattern": "/* not a comment */"} // 注释'
+    assert clean_and_load(planner, text) == {
+        "url": "https://example.com/a//b",
+        "pattern": "/* not a comment */"
+    }
+
+
+def test_clean_converts_single_quotes(planner):
+    """测试单引号字符串转换为双引号，内部的双引号和转义的单引号保持原义"""
+    text = """{'id': 'subtask_1', 'description': 'say "hi" and it\\'s ok'}"""
+    assert clean_and_load(planner, text) == {
+        "id": "subtask_1",
+        "description": "say \"hi\" and it's ok"
+    }
+
+
+def test_clean_inserts_missing_commas(planner):
+    """测试补全属性之间和数组元素之间缺少的逗号"""
+    text = """{
+        "subtasks": [
+            {"id": "subtask_1" "description": "a" "actions": []}
+            {"id": "subtask_2" "description": "b" "actions": [] "dependencies": ["subtask_1"]}
+        ]
+    }"""
+    data = clean_and_load(planner, text)
+    assert [s["id"] for s in data["subtasks"]] == ["subtask_1", "subtask_2"]
+    assert data["subtasks"][1]["dependencies"] == ["subtask_1"]
+
+
+def test_clean_removes_trailing_commas(planner):
+    """测试删除对象和数组末尾多余的逗号（字符串中的逗号保留）"""
+    text = '{"list": [1, 2, 3,], "text": "a,]", "obj": {"a": 1,},}'
+    assert clean_and_load(planner, text) == {"list": [1, 2, 3], "text": "a,]", "obj": {"a": 1}}
+
+
+def test_clean_escapes_control_characters(planner):
+    """测试转义字符串中未转义的换行符和制表符"""
+    text = '{"description": "第一行\n第二行\t结束"}'
+    assert clean_and_load(planner, text) == {"description": "第一行\n第二行\t结束"}
+
+
+def test_clean_keeps_valid_json(planner):
+    """测试有效的 JSON 清理后内容不变"""
+    text = json.dumps(PLAN, ensure_ascii=False, indent=2)
+    assert clean_and_load(planner, text) == PLAN
+
+
+@pytest.mark.parametrize("fence", ["```json", "```"])
+def test_extract_fenced_block(planner, fence):
+    """测试从 markdown 代码块中提取 JSON"""
+    body = json.dumps(PLAN, ensure_ascii=False)
+    response = f"以下是规划：\n{fence}\n{body}\n```\n请确认。"
+    assert json.loads(planner._extract_json_from_response(response)) == PLAN
+
+
+def test_extract_prefers_subtasks_object_over_preceding_object(planner):
+    """测试响应中先出现无关对象时，提取包含 subtasks 的对象"""
+    body = json.dumps(PLAN, ensure_ascii=False)
+    response = f'示例格式：{{"note": "无关"}}\n实际规划：{body}'
+    assert json.loads(planner._extract_json_from_response(response)) == PLAN
+
+
+def test_extract_partial_truncated_subtasks(planner):
+    """测试 subtasks 数组被截断时保留已完整的子任务（字符串中的括号不参与配对）"""
+    first = json.dumps(PLAN["subtasks"][0], ensure_ascii=False)
+    response = '{"subtasks": [' + first + ', {"id": "subtask_2", "description": "未完成 ]}'
+    assert planner._extract_partial_json(response) == {"subtasks": [PLAN["subtasks"][0]]}
+
+
+@pytest.mark.asyncio
+async def test_parse_plan_response_repairs_broken_plan(planner):
+    """测试完整解析流程：注释 + 单引号 + 缺少/多余逗号"""
+    response = """
+{
+    // 两个子任务
+    'subtasks': [
+        {"id": "subtask_1", "description": "打开网页" "actions": [
+            {"type": "gui", "tool": "navigate", "args": {"url": "https://example.com/a//b"}, "description": "打开"},
+        ], "dependencies": []},
+        {"id": "subtask_2", "description": "点击按钮", "actions": [
+            {"type": "gui", "tool": "click", "args": {"selector": "#ok"}, "description": "点击"}
+        ], "dependencies": ["subtask_1"]},
+    ]
+}
+"""
+    assert await planner._parse_plan_response(response) == PLAN
+
+
+@pytest.mark.asyncio
+async def test_parse_plan_response_recovers_truncated_plan(planner):
+    """测试截断的响应通过部分解析保留已完整的子任务"""
+    first = json.dumps(PLAN["subtasks"][0], ensure_ascii=False)
+    response = '{"subtasks": [' + first + ', {"id": "subtask_2", "descr'
+    data = await planner._parse_plan_response(response)
+    assert data["subtasks"] == [PLAN["subtasks"][0]]
+
+
+@pytest.mark.asyncio
+async def test_parse_plan_response_cache_returns_independent_results(planner):
+    """测试重复响应命中缓存，且每次返回的结果互不影响"""
+    response = "规划如下：\n```json\n" + json.dumps(PLAN, ensure_ascii=False) + "\n```"
+    first = await planner._parse_plan_response(response)
+    first["subtasks"].clear()
+    assert response in planner._parse_cache
+    assert await planner._parse_plan_response(response) == PLAN
+
+
+@pytest.mark.asyncio
+async def test_parse_plan_response_does_not_cache_partial_result(planner):
+    """测试部分解析的结果不进入缓存"""
+    first = json.dumps(PLAN["subtasks"][0], ensure_ascii=False)
+    response = '{"subtasks": [' + first + ', {"id": "subtask_2", "descr'
+    await planner._parse_plan_response(response)
+    assert response not in planner._parse_cache